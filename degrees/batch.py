@@ -0,0 +1,164 @@
+"""
+Answer many degrees-of-separation queries over one loaded graph.
+
+Usage:
+    python batch.py [directory] [pairs] [--workers N] [--policy POLICY] [--fuzzy]
+                    [--compact] [--no-snapshot]
+
+Each line of `pairs` (or stdin, if omitted or "-") holds a source and a
+target name separated by a tab. One JSON object is written to stdout per
+query, as soon as its answer is known, so output is not in input order;
+every object carries the input `line` it answers.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import degrees
+
+
+def read_pairs(lines, errors):
+    """
+    Yields (line number, source name, target name) for each query,
+    skipping blank lines and lines starting with "#". An error record is
+    appended to `errors` for each line that isn't a pair of names.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split("\t")
+        if len(fields) != 2:
+            errors.append({"line": number, "error": "expected source<TAB>target"})
+            continue
+        yield number, fields[0].strip(), fields[1].strip()
+
+
+def resolve(queries, policy, fuzzy=False):
+    """
+    Resolve names to person ids with a non-interactive `policy`, falling
+    back to the closest known name if `fuzzy` is true.
+
+    Returns the queries grouped by source id, as a dict of
+    source id -> list of (line, target id), and a list of error records
+    for queries whose names could not be resolved.
+    """
+    groups = {}
+    errors = []
+    cache = {}
+    for line, source_name, target_name in queries:
+        ids = []
+        for name in (source_name, target_name):
+            if name not in cache:
+                cache[name] = degrees.person_id_for_name(name, policy=policy, fuzzy=fuzzy)
+            ids.append(cache[name])
+        source, target = ids
+        if source is None or target is None:
+            missing = source_name if source is None else target_name
+            errors.append({
+                "line": line, "source": source_name, "target": target_name,
+                "error": f"person not found: {missing}"
+            })
+            continue
+        groups.setdefault(source, []).append((line, target))
+    return groups, errors
+
+
+def answer(group):
+    """
+    Answer every query sharing one source with a single search tree.
+    Returns a list of (line, source id, target id, path).
+    """
+    source, queries = group
+    paths = degrees.shortest_paths(source, {target for _, target in queries})
+    return [(line, source, target, paths[target]) for line, target in queries]
+
+
+def record(line, source, target, path):
+    return {
+        "line": line,
+        "source": degrees.people[source]["name"],
+        "target": degrees.people[target]["name"],
+        "source_id": source,
+        "target_id": target,
+        "degrees": None if path is None else len(path),
+        "path": path
+    }
+
+
+def _init_worker(directory, compact, snapshot):
+    # Forked workers inherit the parent's graph; spawned ones load their
+    # own the way the parent did, which is only cheap when a snapshot
+    # can be mapped
+    if not degrees.people:
+        degrees.load_data(directory, compact=compact, snapshot=snapshot)
+
+
+def run(directory, lines, out, workers=None, policy="most-movies", fuzzy=False,
+        compact=False, snapshot=True):
+    """
+    Answer the queries in `lines`, writing JSONL records to `out`.
+    Workers that cannot inherit the loaded graph load `directory` with
+    the same `compact` and `snapshot` settings as load_data.
+    """
+    malformed = []
+    groups, errors = resolve(read_pairs(lines, malformed), policy, fuzzy)
+    for error in sorted(malformed + errors, key=lambda error: error["line"]):
+        out.write(json.dumps(error) + "\n")
+
+    tasks = list(groups.items())
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        results = map(answer, tasks)
+        pool = None
+    else:
+        # A snapshot is a read-only mapping that every worker shares;
+        # otherwise fork lets workers share the parent's pages
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+        pool = ctx.Pool(workers, initializer=_init_worker, initargs=(directory, compact, snapshot))
+        chunksize = max(1, len(tasks) // (workers * 8))
+        results = pool.imap_unordered(answer, tasks, chunksize)
+    try:
+        for answers in results:
+            for answered in answers:
+                out.write(json.dumps(record(*answered)) + "\n")
+            out.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("pairs", nargs="?", default="-")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--policy", default="most-movies",
+                        choices=["most-movies", "first", "none"],
+                        help="how to pick between people with the same name")
+    parser.add_argument("--fuzzy", action="store_true",
+                        help="match misspelled names to the closest known name")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false",
+                        help="load the CSVs even if a snapshot exists")
+    args = parser.parse_args()
+
+    degrees.load_data(args.directory, compact=args.compact, snapshot=args.snapshot)
+    options = {"compact": args.compact, "snapshot": args.snapshot}
+    if args.pairs == "-":
+        run(args.directory, sys.stdin, sys.stdout, args.workers, args.policy, args.fuzzy,
+            **options)
+    else:
+        with open(args.pairs, encoding="utf-8") as f:
+            run(args.directory, f, sys.stdout, args.workers, args.policy, args.fuzzy,
+                **options)
+
+
+if __name__ == "__main__":
+    main()
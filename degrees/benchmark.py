@@ -0,0 +1,441 @@
+"""
+Benchmarks for the degrees search.
+
+Usage:
+    python benchmark.py synthetic DIRECTORY [--people N] [--movies N] [--cast N]
+    python benchmark.py load [DIRECTORY]
+    python benchmark.py search [DIRECTORY] [--pairs N] [--compact]
+    python benchmark.py frontier [--max-exponent N]
+    python benchmark.py landmarks [DIRECTORY] [--pairs N] [--count K]
+    python benchmark.py projection [DIRECTORY] [--pairs N] [--size N] [--compact]
+    python benchmark.py names [DIRECTORY] [--queries N]
+    python benchmark.py stream [DIRECTORY] [--seeds N] [--hops K]
+    python benchmark.py profile [DIRECTORY] [--pairs N]
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+
+def synthetic(directory, n_people, n_movies, cast, seed=0):
+    """
+    Write a random people/movies/stars dataset to `directory`, in the
+    same CSV layout as `small` and `large`. Each movie gets `cast` stars
+    drawn with a bias towards low ids, so some actors become hubs.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    first = ["Ann", "Bob", "Cara", "Dan", "Eve", "Finn", "Gia", "Hal", "Ivy", "Jon"]
+    last = ["Smith", "Jones", "Brown", "Lee", "Khan", "Garcia", "Chen", "Novak"]
+    with open(f"{directory}/people.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(n_people):
+            name = f"{rng.choice(first)} {rng.choice(last)} {i % 997}"
+            writer.writerow([i + 1, name, 1920 + rng.randrange(90)])
+    with open(f"{directory}/movies.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(n_movies):
+            writer.writerow([100000 + i, f"Movie {i}", 1930 + rng.randrange(90)])
+    with open(f"{directory}/stars.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for i in range(n_movies):
+            for _ in range(cast):
+                person = int(n_people * rng.random() ** 2) + 1
+                writer.writerow([person, 100000 + i])
+
+
+def _measure_load(directory, options, trace):
+    import degrees
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    degrees.load_data(directory, **options)
+    elapsed = time.perf_counter() - start
+    if not trace:
+        return elapsed
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak
+
+
+def _compare_loads(directory, stores):
+    """
+    Print load time and memory for each (label, load_data options) in
+    `stores`. Every load runs in a fresh process, once untraced for the
+    time and once under tracemalloc for the memory.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'store':<14}{'load (s)':>12}{'retained (MB)':>16}{'peak (MB)':>12}")
+    for label, options in stores:
+        with ctx.Pool(1, maxtasksperchild=1) as pool:
+            elapsed = pool.apply(_measure_load, (directory, options, False))
+            current, peak = pool.apply(_measure_load, (directory, options, True))
+        print(f"{label:<14}{elapsed:>12.3f}{current / 2 ** 20:>16.1f}{peak / 2 ** 20:>12.1f}")
+
+
+def bench_load(directory):
+    """
+    Compare load time and memory of the dict store, the compact store
+    and a mapped snapshot (compiled first if missing or stale).
+    """
+    from graph import CompactGraph
+    from snapshot import load_snapshot, write_snapshot
+    if load_snapshot(directory) is None:
+        write_snapshot(CompactGraph.from_csv(directory), directory)
+    _compare_loads(directory, (
+        ("dicts", {"snapshot": False}),
+        ("compact", {"compact": True, "snapshot": False}),
+        ("snapshot", {}),
+    ))
+
+
+def bench_stream(directory, seeds, hops, seed=0):
+    """
+    Compare loading everything with loading only the columns search
+    needs, and only the neighbourhood of a few random seed people.
+    """
+    from loader import read_columns
+    rng = random.Random(seed)
+    ids = [person_id for person_id, in read_columns(f"{directory}/people.csv", ("id",))]
+    chosen = rng.sample(ids, seeds)
+    _compare_loads(directory, (
+        ("all columns", {"snapshot": False}),
+        ("ids and names", {"columns": ("name", "title")}),
+        (f"{hops}-hop", {"columns": ("name", "title"), "seeds": chosen, "hops": hops}),
+    ))
+
+
+def bench_search(directory, pairs, compact, seed=0):
+    """
+    Run one-sided and bidirectional search over the same random actor
+    pairs, reporting nodes expanded and latency for each.
+    """
+    import degrees
+    degrees.load_data(directory, compact=compact, snapshot=False)
+    rng = random.Random(seed)
+    ids = list(degrees.people)
+    queries = [(rng.choice(ids), rng.choice(ids)) for _ in range(pairs)]
+
+    # Count expansions by wrapping the neighbour function both searches call
+    expanded = 0
+    neighbors_for_person = degrees.neighbors_for_person
+
+    def counting(person_id):
+        nonlocal expanded
+        expanded += 1
+        return neighbors_for_person(person_id)
+
+    degrees.neighbors_for_person = counting
+    searches = (("bfs", degrees.shortest_path), ("bidirectional", degrees.bidirectional_path))
+    lengths = {}
+    print(f"{'search':<15}{'mean nodes':>12}{'mean (ms)':>12}{'median (ms)':>13}{'max (ms)':>11}")
+    try:
+        for label, search in searches:
+            nodes, times = [], []
+            for source, target in queries:
+                expanded = 0
+                start = time.perf_counter()
+                path = search(source, target)
+                times.append((time.perf_counter() - start) * 1000)
+                nodes.append(expanded)
+                lengths.setdefault((source, target), set()).add(None if path is None else len(path))
+            print(f"{label:<15}{statistics.mean(nodes):>12.0f}{statistics.mean(times):>12.2f}"
+                  f"{statistics.median(times):>13.2f}{max(times):>11.2f}")
+    finally:
+        degrees.neighbors_for_person = neighbors_for_person
+    mismatched = sum(1 for found in lengths.values() if len(found) > 1)
+    print(f"{pairs} pairs, {mismatched} with differing path lengths")
+
+
+def bench_profile(directory, pairs, seed=0):
+    """
+    Time the same BFS queries without and with SearchStats, so the cost
+    of profiling (and of the check that skips it) can be seen.
+    """
+    import degrees
+    from util import SearchStats
+    degrees.load_data(directory, snapshot=False)
+    rng = random.Random(seed)
+    ids = list(degrees.people)
+    queries = [(rng.choice(ids), rng.choice(ids)) for _ in range(pairs)]
+
+    print(f"{'mode':<12}{'mean (ms)':>12}{'median (ms)':>13}{'max (ms)':>11}")
+    for label, profiled in (("disabled", False), ("enabled", True)):
+        times = []
+        for source, target in queries:
+            stats = SearchStats() if profiled else None
+            start = time.perf_counter()
+            degrees.shortest_path(source, target, stats)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<12}{statistics.mean(times):>12.2f}"
+              f"{statistics.median(times):>13.2f}{max(times):>11.2f}")
+
+
+def _random_graph(n, degree, rng):
+    adjacency = [[] for _ in range(n)]
+    for a in range(n):
+        for _ in range(degree // 2):
+            b = rng.randrange(n)
+            adjacency[a].append(b)
+            adjacency[b].append(a)
+    return adjacency
+
+
+def _list_bfs(adjacency, source):
+    """
+    Full BFS the way shortest_path used to run it: list-sliced queue and
+    a linear scan of an explored list for every neighbour.
+    """
+    frontier = [source]
+    explored = []
+    while frontier:
+        state = frontier[0]
+        frontier = frontier[1:]
+        explored.append(state)
+        for neighbor in adjacency[state]:
+            if neighbor not in explored and neighbor not in frontier:
+                frontier.append(neighbor)
+    return len(explored)
+
+
+def _frontier_bfs(adjacency, source):
+    """
+    Full BFS with util.QueueFrontier and a visited set marked on enqueue.
+    """
+    from util import Node, QueueFrontier
+    frontier = QueueFrontier()
+    frontier.add(Node(state=source, parent=None, action=None))
+    visited = {source}
+    while not frontier.empty():
+        node = frontier.remove()
+        for neighbor in adjacency[node.state]:
+            if neighbor not in visited:
+                visited.add(neighbor)
+                frontier.add(Node(state=neighbor, parent=node, action=None))
+    return len(visited)
+
+
+def bench_frontier(max_exponent, list_limit=10 ** 4, seed=0):
+    """
+    Time a full BFS over random graphs of 10^3 up to 10^max_exponent
+    nodes, with the old list frontier (up to `list_limit` nodes, since it
+    is quadratic) and with the deque frontier.
+    """
+    rng = random.Random(seed)
+    print(f"{'nodes':>10}{'list (s)':>12}{'deque (s)':>12}{'deque ns/node':>15}")
+    for exponent in range(3, max_exponent + 1):
+        n = 10 ** exponent
+        adjacency = _random_graph(n, 4, rng)
+        if n <= list_limit:
+            start = time.perf_counter()
+            _list_bfs(adjacency, 0)
+            listed = f"{time.perf_counter() - start:>12.3f}"
+        else:
+            listed = f"{'-':>12}"
+        start = time.perf_counter()
+        reached = _frontier_bfs(adjacency, 0)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>10}{listed}{elapsed:>12.3f}{elapsed / reached * 1e9:>15.0f}")
+
+
+def bench_landmarks(directory, pairs, count, seed=0):
+    """
+    Time plain BFS against landmark lookups (queries from a landmark)
+    and landmark-bounded search (random pairs), on the same queries.
+    """
+    import degrees
+    from landmarks import Landmarks, by_degree
+    degrees.load_data(directory, compact=True, snapshot=False)
+    start = time.perf_counter()
+    table = Landmarks.build(degrees.graph, by_degree(degrees.graph, count))
+    print(f"built {count} landmarks in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(seed)
+    ids = list(degrees.people)
+    hubs = [degrees.graph.person_ids[p] for p in table.landmarks]
+    workloads = (
+        ("from landmark", [(rng.choice(hubs), rng.choice(ids)) for _ in range(pairs)]),
+        ("random pairs", [(rng.choice(ids), rng.choice(ids)) for _ in range(pairs)]),
+    )
+    print(f"{'queries':<15}{'bfs (ms)':>12}{'landmarks (ms)':>16}{'speedup':>10}")
+    for label, queries in workloads:
+        totals = []
+        lengths = []
+        for landmarks in (None, table):
+            degrees.landmarks = landmarks
+            found = []
+            start = time.perf_counter()
+            for source, target in queries:
+                path = degrees.shortest_path(source, target)
+                found.append(None if path is None else len(path))
+            totals.append((time.perf_counter() - start) * 1000 / len(queries))
+            lengths.append(found)
+        degrees.landmarks = None
+        if lengths[0] != lengths[1]:
+            print(f"warning: {label} path lengths differ")
+        print(f"{label:<15}{totals[0]:>12.2f}{totals[1]:>16.2f}{totals[0] / totals[1]:>9.1f}x")
+
+
+def bench_projection(directory, pairs, size, compact, seed=0):
+    """
+    Run the same random queries with plain neighbours and with the cached
+    projection, reporting time, neighbour pairs produced and cache use.
+    """
+    import degrees
+    degrees.load_data(directory, compact=compact, snapshot=False)
+    rng = random.Random(seed)
+    ids = list(degrees.people)
+    queries = [(rng.choice(ids), rng.choice(ids)) for _ in range(pairs)]
+
+    produced = 0
+    neighbors_for_person = degrees.neighbors_for_person
+
+    def counting(person_id):
+        nonlocal produced
+        neighbors = neighbors_for_person(person_id)
+        produced += len(neighbors)
+        return neighbors
+
+    degrees.neighbors_for_person = counting
+    print(f"{'neighbours':<12}{'mean (ms)':>12}{'pairs/query':>14}{'hit rate':>10}{'cache (MB)':>12}")
+    try:
+        for label in ("sets", "projection"):
+            degrees.projection = degrees.Projection(
+                degrees.people, degrees.movies, degrees.graph, size
+            ) if label == "projection" else None
+            produced = 0
+            start = time.perf_counter()
+            for source, target in queries:
+                degrees.shortest_path(source, target)
+            elapsed = (time.perf_counter() - start) * 1000 / pairs
+            if degrees.projection is None:
+                cache = f"{'-':>10}{'-':>12}"
+            else:
+                stats = degrees.projection.stats()
+                cache = f"{stats['hit_rate']:>10.1%}{stats['bytes'] / 2 ** 20:>12.1f}"
+            print(f"{label:<12}{elapsed:>12.2f}{produced / pairs:>14.0f}{cache}")
+    finally:
+        degrees.neighbors_for_person = neighbors_for_person
+        degrees.projection = None
+
+
+def _misspell(name, rng):
+    i = rng.randrange(len(name))
+    edit = rng.choice(("drop", "swap", "replace"))
+    if edit == "drop":
+        return name[:i] + name[i + 1:]
+    if edit == "swap" and i + 1 < len(name):
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[i + 1:]
+
+
+def bench_names(directory, queries, seed=0):
+    """
+    Time prefix and fuzzy lookups of randomly misspelled names against
+    the in-memory and the snapshot name index, and how often the
+    intended name ranks first.
+    """
+    from graph import CompactGraph
+    from snapshot import load_snapshot, write_snapshot
+    graph = CompactGraph.from_csv(directory)
+    start = time.perf_counter()
+    index = graph.name_index()
+    print(f"built index over {len(index.keys)} names in {time.perf_counter() - start:.2f}s")
+    if load_snapshot(directory) is None:
+        write_snapshot(graph, directory)
+
+    rng = random.Random(seed)
+    names = [rng.choice(index.keys) for _ in range(queries)]
+    typos = [_misspell(name, rng) for name in names]
+    print(f"{'index':<10}{'prefix (us)':>13}{'fuzzy (us)':>12}{'top-1':>8}")
+    for label, index in (("memory", index), ("snapshot", load_snapshot(directory).name_index())):
+        start = time.perf_counter()
+        for name in names:
+            index.prefix(name[:4])
+        prefix = (time.perf_counter() - start) * 1e6 / queries
+        hits = 0
+        start = time.perf_counter()
+        for name, typo in zip(names, typos):
+            found = index.fuzzy(typo, limit=5)
+            hits += bool(found) and found[0][0] == name
+        fuzzy = (time.perf_counter() - start) * 1e6 / queries
+        print(f"{label:<10}{prefix:>13.1f}{fuzzy:>12.1f}{hits / queries:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("synthetic", help="write a random dataset")
+    command.add_argument("directory")
+    command.add_argument("--people", type=int, default=100000)
+    command.add_argument("--movies", type=int, default=30000)
+    command.add_argument("--cast", type=int, default=8)
+
+    command = commands.add_parser("load", help="memory and load time per store")
+    command.add_argument("directory", nargs="?", default="large")
+
+    command = commands.add_parser("search", help="bfs against bidirectional search")
+    command.add_argument("directory", nargs="?", default="large")
+    command.add_argument("--pairs", type=int, default=100)
+    command.add_argument("--compact", action="store_true")
+
+    command = commands.add_parser("frontier", help="BFS scaling per frontier")
+    command.add_argument("--max-exponent", type=int, default=6)
+
+    command = commands.add_parser("landmarks", help="bfs against landmarks")
+    command.add_argument("directory", nargs="?", default="large")
+    command.add_argument("--pairs", type=int, default=50)
+    command.add_argument("--count", type=int, default=8)
+
+    command = commands.add_parser("projection", help="neighbour sets against projection")
+    command.add_argument("directory", nargs="?", default="large")
+    command.add_argument("--pairs", type=int, default=50)
+    command.add_argument("--size", type=int, default=100000)
+    command.add_argument("--compact", action="store_true")
+
+    command = commands.add_parser("names", help="prefix and fuzzy name lookups")
+    command.add_argument("directory", nargs="?", default="large")
+    command.add_argument("--queries", type=int, default=1000)
+
+    command = commands.add_parser("stream", help="column and neighbourhood loading")
+    command.add_argument("directory", nargs="?", default="large")
+    command.add_argument("--seeds", type=int, default=3)
+    command.add_argument("--hops", type=int, default=2)
+
+    command = commands.add_parser("profile", help="search with and without statistics")
+    command.add_argument("directory", nargs="?", default="large")
+    command.add_argument("--pairs", type=int, default=100)
+
+    args = parser.parse_args()
+    if args.command == "synthetic":
+        synthetic(args.directory, args.people, args.movies, args.cast)
+    elif args.command == "load":
+        bench_load(args.directory)
+    elif args.command == "search":
+        bench_search(args.directory, args.pairs, args.compact)
+    elif args.command == "frontier":
+        bench_frontier(args.max_exponent)
+    elif args.command == "landmarks":
+        bench_landmarks(args.directory, args.pairs, args.count)
+    elif args.command == "projection":
+        bench_projection(args.directory, args.pairs, args.size, args.compact)
+    elif args.command == "names":
+        bench_names(args.directory, args.queries)
+    elif args.command == "stream":
+        bench_stream(args.directory, args.seeds, args.hops)
+    elif args.command == "profile":
+        bench_profile(args.directory, args.pairs)
+
+
+if __name__ == "__main__":
+    main()
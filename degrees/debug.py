@@ -1,6 +1,7 @@
 import csv
 import sys
 
+from snapshot import load_snapshot
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -17,6 +18,13 @@ def load_data(directory):
     """
     Load data from CSV files into memory.
     """
+    # Map a compiled snapshot if there is an up to date one
+    global names, people, movies
+    graph = load_snapshot(directory)
+    if graph is not None:
+        names, people, movies = graph.names(), graph.people(), graph.movies()
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -1,7 +1,20 @@
-import csv
+import argparse
+import os
 import sys
+import time
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import CompactGraph
+from landmarks import Landmarks
+from loader import neighbourhood, read_columns
+from nameindex import NameIndex
+from projection import Projection
+from snapshot import (load_name_index, load_snapshot, snapshot_path, write_name_index,
+                      write_snapshot)
+from util import (Node, ProfiledQueueFrontier, ProfiledSet, QueueFrontier, SearchStats,
+                  StackFrontier)
+
+# Columns of people.csv and movies.csv that load_data keeps by default
+COLUMNS = ("name", "birth", "title", "year")
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,64 +25,167 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph behind the views above, when loaded with compact=True
+graph = None
+
+# Precomputed Landmarks for graph, when loaded with load_landmarks
+landmarks = None
+
+# Projection answering neighbors_for_person, when enabled with use_projection
+projection = None
+
+# NameIndex over names, built by closest_names on first use
+name_index = None
+
+# Directory whose CSVs were loaded whole into the dicts above, where
+# closest_names keeps their NameIndex between runs
+names_directory = None
 
-def load_data(directory):
+
+def load_data(directory, compact=False, snapshot=True, columns=None,
+              seeds=None, hops=None):
     """
     Load data from CSV files into memory.
+
+    If `compact` is true, build a `CompactGraph` instead and expose it
+    through read-only `names`, `people` and `movies` views. If `snapshot`
+    is true and `directory` has a compiled snapshot, map that instead of
+    parsing the CSVs; a snapshot whose CSVs have changed is rebuilt.
+
+    To bound memory, `columns` lists which of name, birth, title and year
+    to keep (default all), and `seeds` limits loading to the people within
+    `hops` co-star steps of those person_ids (or their whole connected
+    component if `hops` is None). Snapshots are skipped for either.
     """
+    global names, people, movies, graph, name_index, names_directory
+    name_index = names_directory = None
+    partial = columns is not None or seeds is not None
+    if columns is None:
+        columns = COLUMNS
+    keepPeople = keepMovies = None
+    if seeds is not None:
+        keepPeople, keepMovies = neighbourhood(directory, seeds, hops)
+
+    if snapshot and not partial and os.path.exists(snapshot_path(directory)):
+        graph = load_snapshot(directory)
+        if graph is None:
+            graph = CompactGraph.from_csv(directory)
+            write_snapshot(graph, directory)
+        compact = True
+    elif compact:
+        graph = CompactGraph.from_csv(directory, columns, keepPeople, keepMovies)
+    if compact:
+        names, people, movies = graph.names(), graph.people(), graph.movies()
+        return
+
+    if not partial:
+        names_directory = directory
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
+    personColumns = [column for column in ("name", "birth") if column in columns]
+    for person_id, *values in read_columns(f"{directory}/people.csv", ["id"] + personColumns):
+        if keepPeople is not None and person_id not in keepPeople:
+            continue
+        person = dict(zip(personColumns, values))
+        person["movies"] = set()
+        people[person_id] = person
+        if "name" in person:
+            if person["name"].lower() not in names:
+                names[person["name"].lower()] = {person_id}
             else:
-                names[row["name"].lower()].add(row["id"])
+                names[person["name"].lower()].add(person_id)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+    movieColumns = [column for column in ("title", "year") if column in columns]
+    for movie_id, *values in read_columns(f"{directory}/movies.csv", ["id"] + movieColumns):
+        if keepMovies is not None and movie_id not in keepMovies:
+            continue
+        movie = dict(zip(movieColumns, values))
+        movie["stars"] = set()
+        movies[movie_id] = movie
 
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    for person_id, movie_id in read_columns(f"{directory}/stars.csv", ("person_id", "movie_id")):
+        try:
+            people[person_id]["movies"].add(movie_id)
+            movies[movie_id]["stars"].add(person_id)
+        except KeyError:
+            pass
+
+
+def load_landmarks(directory):
+    """
+    Load the landmark trees built by landmarks.py for the loaded graph,
+    so shortest_path can use them. Returns False if there are none, or
+    they are out of date.
+    """
+    global landmarks
+    if graph is None:
+        raise RuntimeError("landmarks need a compact graph")
+    landmarks = Landmarks.load(graph, directory)
+    return landmarks is not None
+
+
+def use_projection(maxsize):
+    """
+    Answer neighbors_for_person from a cached actor-actor projection of
+    the loaded data, holding at most `maxsize` people.
+    """
+    global projection
+    projection = Projection(people, movies, graph, maxsize)
+    return projection
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(usage="python degrees.py [directory]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--compact", action="store_true",
+                        help="store the graph as integer ids and CSR arrays")
+    parser.add_argument("--compile", action="store_true",
+                        help="write a binary snapshot for faster later runs")
+    parser.add_argument("--landmarks", action="store_true",
+                        help="use the trees built by landmarks.py")
+    parser.add_argument("--project", type=int, metavar="SIZE",
+                        help="cache deduplicated neighbours of up to SIZE people")
+    parser.add_argument("--seeds", nargs="+", metavar="ID",
+                        help="only load people connected to these person ids")
+    parser.add_argument("--hops", type=int,
+                        help="with --seeds, only load people this many steps away")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--profile", action="store_true",
+                        help="print search statistics for the query as JSON")
+    args = parser.parse_args()
+    if args.profile and args.bidirectional:
+        parser.error("--profile records the BFS search, not --bidirectional")
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    if args.compile:
+        path = write_snapshot(CompactGraph.from_csv(args.directory), args.directory)
+        print(f"Snapshot written to {path}.")
+    load_data(args.directory, compact=args.compact or args.landmarks,
+              seeds=args.seeds, hops=args.hops)
+    if args.landmarks and not load_landmarks(args.directory):
+        sys.exit("No up to date landmarks, run landmarks.py first.")
+    if args.project:
+        use_projection(args.project)
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    name = input("Name: ")
+    source = person_id_for_name(name)
     if source is None:
-        sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+        sys.exit(not_found(name))
+    name = input("Name: ")
+    target = person_id_for_name(name)
     if target is None:
-        sys.exit("Person not found.")
+        sys.exit(not_found(name))
 
-    path = shortest_path(source, target)
+    stats = SearchStats() if args.profile else None
+    if args.bidirectional:
+        path = bidirectional_path(source, target)
+    else:
+        path = shortest_path(source, target, stats)
 
     if path is None:
         print("Not connected.")
@@ -83,41 +199,176 @@ def main():
             movie = movies[path[i + 1][0]]["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
+    if projection is not None:
+        cache = projection.stats()
+        print(f"Neighbour cache: {cache['hit_rate']:.1%} hit rate, "
+              f"{cache['entries']} people, {cache['bytes'] / 2 ** 20:.1f} MB.")
+    if stats is not None:
+        print(stats.to_json())
+
 
-def shortest_path(source, target):
+def shortest_path(source, target, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
-    If no possible path, returns None.
+    If no possible path, returns None. If `stats` is a SearchStats, the
+    search records what it did into it.
     """
+    if stats is not None:
+        return profiled_path(source, target, stats)
 
-    # TODO
-    # Define frontier
-    frontier = QueueFrontier()
-    # Start Frontier with the initial state (actor)
-    initialState = Node(state=source, parent=None, action=None)
-    frontier.add(initialState)
-    explored = []
+    # Read paths off landmark trees, or let them bound the search
+    if landmarks is not None:
+        return landmarks.shortest_path(source, target)
+    return breadth_first(source, {target})[target]
 
-    # Repeat
-    while True:
-        # If frontier empty, no solution
-        if frontier.empty():
-            return None
-        # Save the first actor on the frontier to explored, then remove
+
+def profiled_path(source, target, stats):
+    """
+    Runs the same search as `shortest_path`, recording nodes expanded,
+    peak frontier size, and time spent generating neighbours and checking
+    membership into `stats`.
+    """
+    start = time.perf_counter()
+    if landmarks is not None:
+        stats.search = "landmarks"
+        path = landmarks.shortest_path(source, target)
+    else:
+        path = breadth_first(source, {target}, stats)[target]
+    stats.elapsed = time.perf_counter() - start
+    stats.length = None if path is None else len(path)
+    return path
+
+
+def shortest_paths(source, targets):
+    """
+    Returns a dict mapping each of `targets` to the shortest list of
+    (movie_id, person_id) pairs that connect the source to it, or to
+    None if there is no path.
+
+    A single breadth-first search from the source answers every target.
+    """
+    return breadth_first(source, targets)
+
+
+def breadth_first(source, targets, stats=None):
+    """
+    Searches breadth first from the source until every one of `targets`
+    is reached, returning a dict mapping each to the shortest list of
+    (movie_id, person_id) pairs that connect the source to it, or to
+    None if there is no path.
+
+    If `stats` is a SearchStats, the frontier, visited set and neighbour
+    lookup are swapped for ones that record into it; otherwise the loop
+    runs on the plain ones and pays nothing for profiling.
+    """
+    neighbors = neighbors_for_person
+    if stats is None:
+        frontier, visited = QueueFrontier(), {source}
+    else:
+        frontier, visited = ProfiledQueueFrontier(stats), ProfiledSet({source}, stats)
+
+        def neighbors(person_id):
+            stats.expanded += 1
+            started = time.perf_counter()
+            found = neighbors_for_person(person_id)
+            stats.neighbor_time += time.perf_counter() - started
+            stats.generated += len(found)
+            return found
+
+    remaining = set(targets)
+    paths = dict.fromkeys(remaining)
+    if source in remaining:
+        paths[source] = []
+        remaining.discard(source)
+    frontier.add(Node(state=source, parent=None, action=None))
+    # Actors are marked visited when they are queued, so nobody is added
+    # to the frontier twice, and every queued actor is one step further
+    # than the one it was reached from, so a target's path is known as
+    # soon as it is reached
+    while remaining and not frontier.empty():
         node = frontier.remove()
-        # If actor is target, end
-        if node.state == target:
-            return returnSequence(node)
-        # Add node (actor) to explored set
-        explored.append(node)
-        # Find neighbors of actor and add to frontier
-        neighbors = neighbors_for_person(node.state)
-        for neighbor in neighbors:
-            newNode = Node(state=neighbor[1], parent=node, action=neighbor[0])
-            if (checkNode(newNode, explored)):
-                frontier.add(newNode)
+        for movie_id, person_id in neighbors(node.state):
+            if person_id in visited:
+                continue
+            visited.add(person_id)
+            new_node = Node(state=person_id, parent=node, action=movie_id)
+            if person_id in remaining:
+                paths[person_id] = returnSequence(new_node)
+                remaining.discard(person_id)
+                if not remaining:
+                    return paths
+            frontier.add(new_node)
+    return paths
+
+
+def bidirectional_path(source, target):
+    """
+    Returns the same shortest list of (movie_id, person_id) pairs as
+    `shortest_path`, searching outwards from the source and the target
+    in turn and always expanding whichever frontier is smaller.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Each side maps a reached person to (movie_id, person it was reached
+    # from, distance from that side's start)
+    forward = {source: (None, None, 0)}
+    backward = {target: (None, None, 0)}
+    forwardFrontier = [source]
+    backwardFrontier = [target]
+
+    while forwardFrontier and backwardFrontier:
+        # Grow the smaller side by one full level
+        if len(forwardFrontier) <= len(backwardFrontier):
+            reached, other, frontier = forward, backward, forwardFrontier
+        else:
+            reached, other, frontier = backward, forward, backwardFrontier
+
+        nextFrontier = []
+        best = None
+        for person in frontier:
+            depth = reached[person][2] + 1
+            for movie_id, person_id in neighbors_for_person(person):
+                if person_id in reached:
+                    continue
+                reached[person_id] = (movie_id, person, depth)
+                nextFrontier.append(person_id)
+                # The levels meet; keep the shortest join in this level
+                if person_id in other:
+                    length = depth + other[person_id][2]
+                    if best is None or length < best[0]:
+                        best = (length, person_id)
+
+        if best is not None:
+            return join_paths(forward, backward, best[1])
+        if reached is forward:
+            forwardFrontier = nextFrontier
+        else:
+            backwardFrontier = nextFrontier
+
+    return None
+
+
+def join_paths(forward, backward, meeting):
+    # Walk back from the meeting person to the source
+    path = []
+    person = meeting
+    while forward[person][1] is not None:
+        movie_id, parent, _ = forward[person]
+        path.append((movie_id, person))
+        person = parent
+    path.reverse()
+    # Then walk on from the meeting person to the target
+    person = meeting
+    while backward[person][1] is not None:
+        movie_id, parent, _ = backward[person]
+        path.append((movie_id, parent))
+        person = parent
+    return path
 
 def returnSequence(node):
     movies = []
@@ -131,29 +382,37 @@ def returnSequence(node):
     actors.reverse()
     return list(zip(movies, actors))
 
-# checks for NO match
-def checkNode(node, list):
-    for item in list:
-        # get item's person_id, compare it to node's person id
-        # if a match, return false, else, return true
-        if item.state == node.state:
-            return False
-    return True
-
-def person_id_for_name(name):
+def person_id_for_name(name, policy="ask", fuzzy=False):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    `policy` decides between people who share the name: "ask" prompts
+    for an id, "most-movies" picks whoever starred in the most movies,
+    "first" picks the lowest id, and "none" returns None. If `fuzzy` is
+    true, a name with no exact match falls back to the closest name.
     """
     person_ids = list(names.get(name.lower(), set()))
+    if len(person_ids) == 0 and fuzzy:
+        closest = closest_names(name, limit=1)
+        if closest:
+            person_ids = list(names[closest[0][0]])
     if len(person_ids) == 0:
         return None
+    elif len(person_ids) > 1 and policy != "ask":
+        if policy == "most-movies":
+            return min(person_ids, key=lambda p: (-len(people[p]["movies"]), len(p), p))
+        elif policy == "first":
+            return min(person_ids, key=lambda p: (len(p), p))
+        elif policy == "none":
+            return None
+        raise ValueError(f"unknown policy {policy!r}")
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
             name = person["name"]
-            birth = person["birth"]
+            birth = person.get("birth")
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
         try:
             person_id = input("Intended Person ID: ")
@@ -166,11 +425,48 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def closest_names(name, limit=10):
+    """
+    Returns up to `limit` (lowercase name, score) pairs for the known
+    names closest to `name`, best first, allowing for misspellings.
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None:
+            name_index = graph.name_index()
+        elif names_directory is not None:
+            name_index = load_name_index(names_directory)
+        if name_index is None:
+            name_index = NameIndex.build(sorted(names))
+            if names_directory is not None:
+                try:
+                    write_name_index(name_index, names_directory)
+                except OSError:
+                    # A read-only dataset builds the index every run
+                    pass
+    return name_index.fuzzy(name, limit)
+
+
+def not_found(name):
+    """
+    Returns a "Person not found." message suggesting close names.
+    """
+    suggestions = []
+    for match, _ in closest_names(name, limit=3):
+        person_id = min(names[match])
+        suggestions.append(people[person_id]["name"])
+    if not suggestions:
+        return "Person not found."
+    return f"Person not found. Did you mean: {', '.join(suggestions)}?"
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if projection is not None:
+        return projection.neighbors(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,261 @@
+import bisect
+from array import array
+from collections.abc import Mapping
+
+from loader import read_columns
+from nameindex import NameIndex
+
+
+class CompactGraph():
+    """
+    People, movies and stars stored as interned integer ids.
+
+    Every person and movie gets a position in file order. Adjacency is
+    kept as two CSR arrays of those positions: `person_offsets` and
+    `person_movies` map a person to the movies they starred in, and
+    `movie_offsets` and `movie_stars` map a movie to its stars. The
+    original string ids are kept only once, in `person_ids` and
+    `movie_ids`.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 name_order, person_index=None, movie_index=None, name_index=None):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        # Person positions sorted by lowercase name, for name lookups
+        self.name_order = name_order
+        if person_index is None:
+            person_index = {pid: i for i, pid in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {mid: i for i, mid in enumerate(movie_ids)}
+        self.person_index = person_index
+        self.movie_index = movie_index
+        self._name_index = name_index
+
+    @classmethod
+    def from_csv(cls, directory, columns=None, keep_people=None, keep_movies=None):
+        """
+        Build a compact graph from `people.csv`, `movies.csv` and
+        `stars.csv` in `directory`.
+
+        Births and years left out of `columns` are stored as empty
+        strings. If given, only people in `keep_people` and movies in
+        `keep_movies` are loaded.
+        """
+        keep = set(columns) if columns is not None else {"birth", "year"}
+
+        person_ids, person_names, person_births = [], [], []
+        births = {"": ""}
+        wanted = ["id", "name"] + (["birth"] if "birth" in keep else [])
+        for person_id, name, *birth in read_columns(f"{directory}/people.csv", wanted):
+            if keep_people is not None and person_id not in keep_people:
+                continue
+            birth = birth[0] if birth else ""
+            person_ids.append(person_id)
+            person_names.append(name)
+            person_births.append(births.setdefault(birth, birth))
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        years = {"": ""}
+        wanted = ["id", "title"] + (["year"] if "year" in keep else [])
+        for movie_id, title, *year in read_columns(f"{directory}/movies.csv", wanted):
+            if keep_movies is not None and movie_id not in keep_movies:
+                continue
+            year = year[0] if year else ""
+            movie_ids.append(movie_id)
+            movie_titles.append(title)
+            movie_years.append(years.setdefault(year, year))
+
+        person_index = {pid: i for i, pid in enumerate(person_ids)}
+        movie_index = {mid: i for i, mid in enumerate(movie_ids)}
+
+        # Single pass over stars, keeping (person, movie) positions as edges
+        edge_people = array("i")
+        edge_movies = array("i")
+        for person_id, movie_id in read_columns(f"{directory}/stars.csv", ("person_id", "movie_id")):
+            p = person_index.get(person_id)
+            m = movie_index.get(movie_id)
+            if p is None or m is None:
+                continue
+            edge_people.append(p)
+            edge_movies.append(m)
+
+        person_offsets, person_movies = build_csr(
+            len(person_ids), edge_people, edge_movies, len(movie_ids)
+        )
+        movie_offsets, movie_stars = build_csr(
+            len(movie_ids), edge_movies, edge_people, len(person_ids)
+        )
+        del edge_people, edge_movies
+
+        lowered = [name.lower() for name in person_names]
+        name_order = array("i", sorted(range(len(lowered)), key=lowered.__getitem__))
+        del lowered
+
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years,
+                   person_offsets, person_movies, movie_offsets, movie_stars,
+                   name_order, person_index, movie_index)
+
+    def movies_of(self, p):
+        """
+        Returns positions of the movies person position `p` starred in.
+        """
+        return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+
+    def stars_of(self, m):
+        """
+        Returns positions of the people who starred in movie position `m`.
+        """
+        return self.movie_stars[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+
+    def name_index(self):
+        """
+        Returns a NameIndex over the distinct lowercase names, building it
+        on first use.
+        """
+        if self._name_index is None:
+            self._name_index = NameIndex.build(self.names())
+        return self._name_index
+
+    def people(self):
+        return PeopleView(self)
+
+    def movies(self):
+        return MoviesView(self)
+
+    def names(self):
+        return NamesView(self)
+
+
+def build_csr(n, rows, cols, width):
+    """
+    Sort parallel `rows` and `cols` arrays into CSR form with `n` rows,
+    where every column is below `width`. Columns within a row come out
+    sorted and duplicates are dropped.
+    """
+    # One integer key per edge, so a single C-level sort orders them all
+    keys = sorted({r * width + c for r, c in zip(rows, cols)})
+    offsets = array("i", bytes(4 * (n + 1)))
+    for k in keys:
+        offsets[k // width + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    values = array("i", [k % width for k in keys])
+    return offsets, values
+
+
+class PeopleView(Mapping):
+    """
+    Read-only `people` dict over a compact graph: maps person_ids to a
+    dictionary of: name, birth, movies (movie_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        g = self.graph
+        p = g.person_index.get(person_id)
+        if p is None:
+            raise KeyError(person_id)
+        return {
+            "name": g.person_names[p],
+            "birth": g.person_births[p],
+            "movies": tuple(g.movie_ids[m] for m in g.movies_of(p))
+        }
+
+    def __contains__(self, person_id):
+        return self.graph.person_index.get(person_id) is not None
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only `movies` dict over a compact graph: maps movie_ids to a
+    dictionary of: title, year, stars (person_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        g = self.graph
+        m = g.movie_index.get(movie_id)
+        if m is None:
+            raise KeyError(movie_id)
+        return {
+            "title": g.movie_titles[m],
+            "year": g.movie_years[m],
+            "stars": tuple(g.person_ids[p] for p in g.stars_of(m))
+        }
+
+    def __contains__(self, movie_id):
+        return self.graph.movie_index.get(movie_id) is not None
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Read-only `names` dict over a compact graph: maps lowercase names to
+    a set of corresponding person_ids, found by binary search over the
+    graph's name order.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.keys = _SortedNames(graph)
+
+    def __getitem__(self, name):
+        g = self.graph
+        lo = bisect.bisect_left(self.keys, name)
+        hi = bisect.bisect_right(self.keys, name, lo)
+        if lo == hi:
+            raise KeyError(name)
+        return {g.person_ids[g.name_order[i]] for i in range(lo, hi)}
+
+    def __iter__(self):
+        previous = None
+        for name in self.keys:
+            if name != previous:
+                yield name
+            previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class _SortedNames():
+    """
+    Lowercase person names in name order, as a sequence for `bisect`.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, i):
+        g = self.graph
+        return g.person_names[g.name_order[i]].lower()
+
+    def __len__(self):
+        return len(self.graph.name_order)
@@ -0,0 +1,280 @@
+"""
+Precomputed single-source BFS trees from a few landmark people.
+
+Usage:
+    python landmarks.py [directory] [--count K]
+
+Picks the K people with the highest degree as landmarks and stores, for
+each, the distance and BFS parent of every person in `degrees.landmarks`
+next to the data. Paths from or to a landmark are then read straight
+off its tree, and distances to the landmarks bound every other query
+(the ALT lower bound |d(L, v) - d(L, t)| <= d(v, t)).
+"""
+
+import argparse
+import os
+import time
+from array import array
+
+from graph import CompactGraph
+from snapshot import fingerprint, is_fresh, load_snapshot, read_sections, write_sections
+
+MAGIC = b"DEGLMK02"
+
+
+def landmarks_path(directory):
+    return os.path.join(directory, "degrees.landmarks")
+
+
+def by_degree(graph, count):
+    """
+    Returns the positions of the `count` people with the most co-star
+    edges (summed cast sizes of their movies).
+    """
+    po, pm, mo = graph.person_offsets, graph.person_movies, graph.movie_offsets
+    degree = array("i", [
+        sum(mo[pm[k] + 1] - mo[pm[k]] for k in range(po[p], po[p + 1]))
+        for p in range(len(po) - 1)
+    ])
+    return sorted(range(len(degree)), key=degree.__getitem__, reverse=True)[:count]
+
+
+def bfs_tree(graph, root):
+    """
+    Returns distance, parent and via arrays of a BFS tree from person
+    position `root`. `parent[p]` is the person p was reached from through
+    movie `via[p]`; unreachable people have distance -1.
+    """
+    n = len(graph.person_offsets) - 1
+    po, pm = graph.person_offsets, graph.person_movies
+    mo, ms = graph.movie_offsets, graph.movie_stars
+    distance = array("i", [-1]) * n
+    parent = array("i", [-1]) * n
+    via = array("i", [-1]) * n
+    # A movie's stars all get reached the first time the movie is opened,
+    # so no movie needs to be opened twice
+    opened = bytearray(len(mo) - 1)
+    distance[root] = 0
+    level = [root]
+    depth = 0
+    while level:
+        depth += 1
+        nextLevel = []
+        for p in level:
+            for k in range(po[p], po[p + 1]):
+                m = pm[k]
+                if opened[m]:
+                    continue
+                opened[m] = 1
+                for j in range(mo[m], mo[m + 1]):
+                    q = ms[j]
+                    if distance[q] < 0:
+                        distance[q] = depth
+                        parent[q] = p
+                        via[q] = m
+                        nextLevel.append(q)
+        level = nextLevel
+    return distance, parent, via
+
+
+class Landmarks():
+    """
+    BFS trees from landmark people over a CompactGraph, answering
+    `shortest_path` queries in the same (movie_id, person_id) format.
+    """
+
+    def __init__(self, graph, landmarks, trees):
+        self.graph = graph
+        self.landmarks = list(landmarks)
+        self.trees = list(trees)
+        self.position = {p: k for k, p in enumerate(self.landmarks)}
+
+    @classmethod
+    def build(cls, graph, landmarks):
+        return cls(graph, landmarks, [bfs_tree(graph, p) for p in landmarks])
+
+    def save(self, directory):
+        """
+        Write the trees to `degrees.landmarks` in `directory`, laid out by
+        `write_sections`: one int32 section holding distance, parent and
+        via for each landmark in turn.
+        """
+        header = {
+            "landmarks": [self.graph.person_ids[p] for p in self.landmarks],
+            "people": len(self.graph.person_offsets) - 1,
+            "sources": fingerprint(directory)
+        }
+        trees = array("i")
+        for tree in self.trees:
+            for values in tree:
+                trees.extend(values)
+        return write_sections(landmarks_path(directory), MAGIC, header, [("trees", "i", trees.tobytes())])
+
+    @classmethod
+    def load(cls, graph, directory):
+        """
+        Map `degrees.landmarks` from `directory` for `graph`, or return
+        None if it is missing or was built from different CSVs.
+        """
+        mapped = read_sections(landmarks_path(directory), MAGIC)
+        if mapped is None:
+            return None
+        header, sections = mapped
+        n = len(graph.person_offsets) - 1
+        if header["people"] != n or not is_fresh(directory, header["sources"]):
+            return None
+
+        arrays = sections["trees"]
+        trees = []
+        for k in range(len(header["landmarks"])):
+            base = 3 * n * k
+            trees.append((arrays[base:base + n],
+                          arrays[base + n:base + 2 * n],
+                          arrays[base + 2 * n:base + 3 * n]))
+        landmarks = [graph.person_index.get(pid) for pid in header["landmarks"]]
+        return cls(graph, landmarks, trees)
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs that
+        connect the source to the target, or None if there is none.
+        """
+        g = self.graph
+        s, t = g.person_index.get(source), g.person_index.get(target)
+        if s == t:
+            return []
+        if s in self.position:
+            steps = self.from_landmark(self.position[s], t)
+        elif t in self.position:
+            steps = self.to_landmark(self.position[t], s)
+        else:
+            steps = self.search(s, t)
+        if steps is None:
+            return None
+        return [(g.movie_ids[m], g.person_ids[p]) for m, p in steps]
+
+    def to_landmark(self, k, p):
+        """
+        Returns (movie, person) position steps from `p` to landmark `k`.
+        """
+        distance, parent, via = self.trees[k]
+        if distance[p] < 0:
+            return None
+        steps = []
+        while distance[p] > 0:
+            steps.append((via[p], parent[p]))
+            p = parent[p]
+        return steps
+
+    def from_landmark(self, k, p):
+        """
+        Returns (movie, person) position steps from landmark `k` to `p`.
+        """
+        distance, parent, via = self.trees[k]
+        if distance[p] < 0:
+            return None
+        steps = []
+        while distance[p] > 0:
+            steps.append((via[p], p))
+            p = parent[p]
+        steps.reverse()
+        return steps
+
+    def search(self, s, t):
+        """
+        A* from `s` to `t` guided by landmark lower bounds, in position
+        steps. Returns None if there is no path.
+        """
+        bounds = []
+        upper, through = None, None
+        for k, (distance, _, _) in enumerate(self.trees):
+            ds, dt = distance[s], distance[t]
+            # A landmark that reaches exactly one of them splits components
+            if (ds < 0) != (dt < 0):
+                return None
+            if dt >= 0:
+                bounds.append((distance, dt))
+                if upper is None or ds + dt < upper:
+                    upper, through = ds + dt, k
+
+        def estimate(p):
+            return max((abs(d[p] - dt) for d, dt in bounds), default=0)
+
+        # Going through a landmark already meets the lower bound
+        if upper is not None and upper == estimate(s):
+            return self.to_landmark(through, s) + self.from_landmark(through, t)
+
+        g = self.graph
+        po, pm = g.person_offsets, g.person_movies
+        mo, ms = g.movie_offsets, g.movie_stars
+        cost = {s: 0}
+        parents = {s: None}
+        # Cheapest cost a movie has been opened at
+        opened = {}
+        # Bucket queue on f = cost + estimate, which never decreases
+        buckets = [[] for _ in range(estimate(s) + 1)]
+        buckets[-1].append((0, s))
+        f = len(buckets) - 1
+        while f < len(buckets):
+            if not buckets[f]:
+                f += 1
+                continue
+            c, p = buckets[f].pop()
+            if c != cost[p]:
+                continue
+            if p == t:
+                steps = []
+                while parents[p] is not None:
+                    m, parent = parents[p]
+                    steps.append((m, p))
+                    p = parent
+                steps.reverse()
+                return steps
+            for k in range(po[p], po[p + 1]):
+                m = pm[k]
+                if opened.get(m, c + 1) <= c:
+                    continue
+                opened[m] = c
+                for j in range(mo[m], mo[m + 1]):
+                    q = ms[j]
+                    if c + 1 < cost.get(q, c + 2):
+                        h = estimate(q)
+                        if upper is not None and c + 1 + h > upper:
+                            continue
+                        cost[q] = c + 1
+                        parents[q] = (m, p)
+                        while len(buckets) <= c + 1 + h:
+                            buckets.append([])
+                        buckets[c + 1 + h].append((c + 1, q))
+        if upper is not None:
+            return self.to_landmark(through, s) + self.from_landmark(through, t)
+        return None
+
+
+def load_graph(directory):
+    graph = load_snapshot(directory)
+    if graph is None:
+        graph = CompactGraph.from_csv(directory)
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--count", type=int, default=8,
+                        help="number of landmarks, highest degree first")
+    args = parser.parse_args()
+
+    graph = load_graph(args.directory)
+    start = time.perf_counter()
+    chosen = by_degree(graph, args.count)
+    table = Landmarks.build(graph, chosen)
+    path = table.save(args.directory)
+    print(f"Built {len(chosen)} landmarks in {time.perf_counter() - start:.1f}s, "
+          f"written to {path}.")
+    for p in chosen:
+        print(f"  {graph.person_ids[p]}: {graph.person_names[p]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import csv
+from operator import itemgetter
+
+
+def read_columns(path, columns):
+    """
+    Yields a tuple of the named `columns` for each row of the CSV at
+    `path`, without building a dict per row.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        indices = [header.index(column) for column in columns]
+        if len(indices) == 1:
+            index = indices[0]
+            for row in reader:
+                yield (row[index],)
+        else:
+            getter = itemgetter(*indices)
+            for row in reader:
+                yield getter(row)
+
+
+def neighbourhood(directory, seeds, hops=None):
+    """
+    Returns the sets of person_ids and movie_ids within `hops` co-star
+    steps of the `seeds` person_ids, or in their connected component if
+    `hops` is None.
+
+    Only stars.csv is read, two passes per hop, and nothing outside the
+    neighbourhood is kept.
+    """
+    path = f"{directory}/stars.csv"
+    people = set(seeds)
+    movies = set()
+    frontier = set(seeds)
+    hop = 0
+    while frontier and (hops is None or hop < hops):
+        # Movies the newest people starred in
+        found = set()
+        for person_id, movie_id in read_columns(path, ("person_id", "movie_id")):
+            if person_id in frontier and movie_id not in movies:
+                found.add(movie_id)
+        movies |= found
+        # Everyone else in those movies
+        frontier = set()
+        for person_id, movie_id in read_columns(path, ("person_id", "movie_id")):
+            if movie_id in found and person_id not in people:
+                frontier.add(person_id)
+        people |= frontier
+        hop += 1
+    return people, movies
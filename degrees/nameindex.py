@@ -0,0 +1,142 @@
+import bisect
+import math
+from array import array
+from collections import Counter
+
+# Posting lists longer than this are not read by a fuzzy search, unless
+# the query has no rarer trigram: a trigram in that many names does
+# little to narrow the search, and counting its names costs the most
+MAX_POSTINGS = 512
+
+
+def trigrams(name):
+    """
+    Returns the set of 3-letter substrings of a padded name, so the start
+    and end of the name count as well.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex():
+    """
+    Index over distinct lowercase names: the names in sorted order, for
+    prefix search, and a trigram inverted index for fuzzy search.
+
+    `grams` holds the distinct trigrams in sorted order; the positions of
+    the names containing `grams[i]` are
+    `postings[offsets[i]:offsets[i + 1]]`, and `sizes[p]` is how many
+    distinct trigrams name `p` has.
+    """
+
+    def __init__(self, keys, grams, offsets, postings, sizes):
+        self.keys = keys
+        self.grams = grams
+        self.offsets = offsets
+        self.postings = postings
+        self.sizes = sizes
+
+    @classmethod
+    def build(cls, keys):
+        """
+        Build an index over `keys`, distinct lowercase names in sorted
+        order.
+        """
+        keys = list(keys)
+        lists = {}
+        sizes = array("H")
+        for i, name in enumerate(keys):
+            grams = trigrams(name)
+            sizes.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                if gram not in lists:
+                    lists[gram] = array("i")
+                lists[gram].append(i)
+        grams = sorted(lists)
+        offsets = array("i", [0])
+        postings = array("i")
+        for gram in grams:
+            postings.extend(lists.pop(gram))
+            offsets.append(len(postings))
+        return cls(keys, grams, offsets, postings, sizes)
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` names starting with `prefix`, in order.
+        """
+        prefix = prefix.lower()
+        found = []
+        i = bisect.bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(found) < limit:
+            name = self.keys[i]
+            if not name.startswith(prefix):
+                break
+            found.append(name)
+            i += 1
+        return found
+
+    def fuzzy(self, query, limit=10, threshold=0.5):
+        """
+        Returns up to `limit` (name, score) pairs for the names most like
+        `query`, best first. The score is the Dice coefficient of the two
+        names' trigram sets, and names scoring below `threshold` are left
+        out. Only names sharing one of the query's rarer trigrams are
+        considered, so a name made only of common trigrams may be missed.
+        """
+        query = query.lower()
+        grams = trigrams(query)
+        lists = []
+        for gram in grams:
+            i = bisect.bisect_left(self.grams, gram)
+            if i < len(self.grams) and self.grams[i] == gram:
+                lists.append((self.offsets[i + 1] - self.offsets[i], i))
+            else:
+                lists.append((0, -1))
+        lists.sort()
+
+        # Sharing c trigrams scores at most 2c / (len(grams) + c), so a match
+        # shares at least `need` of them and must turn up in one of the
+        # rarest len(grams) - need + 1 lists; the commonest are never read.
+        # Past MAX_POSTINGS names a list is skipped too, which can miss a
+        # name sharing only common trigrams with the query
+        need = max(1, math.ceil(threshold * len(grams) / (2 - threshold)))
+        read = 0
+        while read < len(lists) - need + 1 and (
+            lists[read][0] <= MAX_POSTINGS or not any(length for length, _ in lists[:read])
+        ):
+            read += 1
+        skipped = len(lists) - read
+        shared = Counter()
+        for _, i in lists[:read]:
+            if i >= 0:
+                shared.update(self.postings[self.offsets[i]:self.offsets[i + 1]])
+
+        # The most a candidate can score, if it holds every skipped trigram
+        # it has room for; candidates are checked best bound first, so
+        # once one can't beat the floor, no later one can
+        q = len(grams)
+        sizes = self.sizes
+        bounds = []
+        for position, count in shared.items():
+            size = sizes[position]
+            bound = 2 * min(count + skipped, size) / (q + size)
+            if bound >= threshold:
+                bounds.append((bound, position))
+        bounds.sort(reverse=True)
+
+        scored = []
+        floor = threshold
+        for bound, position in bounds:
+            if bound < floor:
+                break
+            name = self.keys[position]
+            other = trigrams(name)
+            score = 2 * len(grams & other) / (q + len(other))
+            if score >= floor:
+                scored.append((-score, abs(len(name) - len(query)), name))
+                scored.sort()
+                del scored[limit:]
+                # With `limit` names found, only better ones matter
+                if len(scored) == limit:
+                    floor = max(floor, -scored[-1][0])
+        return [(name, -score) for score, _, name in scored]
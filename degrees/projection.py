@@ -0,0 +1,91 @@
+import sys
+from collections import OrderedDict
+
+
+class Projection():
+    """
+    Actor-actor projection of the people/movies graph, built lazily one
+    person at a time and kept in an LRU cache of `maxsize` people.
+
+    Each co-star appears once, with a single representative movie, where
+    `neighbors_for_person` yields one pair per shared movie.
+    """
+
+    def __init__(self, people, movies, graph=None, maxsize=100000):
+        self.people = people
+        self.movies = movies
+        # With a CompactGraph, neighbours are found on integer positions
+        self.graph = graph
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+
+    def neighbors(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs, one per co-star of a person.
+        """
+        cache = self.cache
+        pairs = cache.get(person_id)
+        if pairs is not None:
+            self.hits += 1
+            cache.move_to_end(person_id)
+            return pairs
+
+        self.misses += 1
+        pairs = self.project(person_id)
+        cache[person_id] = pairs
+        self.size += _sizeof(pairs)
+        if len(cache) > self.maxsize:
+            _, evicted = cache.popitem(last=False)
+            self.size -= _sizeof(evicted)
+            self.evictions += 1
+        return pairs
+
+    def project(self, person_id):
+        costars = {}
+        g = self.graph
+        if g is not None:
+            p = g.person_index.get(person_id)
+            if p is None:
+                raise KeyError(person_id)
+            for m in g.movies_of(p):
+                for q in g.stars_of(m):
+                    if q not in costars:
+                        costars[q] = m
+            costars.pop(p, None)
+            return tuple((g.movie_ids[m], g.person_ids[q]) for q, m in costars.items())
+
+        for movie_id in self.people[person_id]["movies"]:
+            for costar in self.movies[movie_id]["stars"]:
+                if costar not in costars:
+                    costars[costar] = movie_id
+        costars.pop(person_id, None)
+        return tuple((movie_id, costar) for costar, movie_id in costars.items())
+
+    def stats(self):
+        """
+        Returns cache counters: hits, misses, evictions, hit rate, cached
+        people and approximate bytes held.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.cache),
+            "bytes": self.size
+        }
+
+
+# Size of one (movie_id, person_id) tuple, not counting its strings
+PAIR_SIZE = sys.getsizeof(("", ""))
+
+
+def _sizeof(pairs):
+    # Approximate: id strings are left out, as they mostly belong to the
+    # graph already
+    return sys.getsizeof(pairs) + len(pairs) * PAIR_SIZE
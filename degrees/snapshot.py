@@ -0,0 +1,308 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+
+from graph import CompactGraph
+from nameindex import NameIndex
+
+MAGIC = b"DEGSNAP1"
+VERSION = 2
+NAMES_MAGIC = b"DEGNAME1"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# CSV hashes found to still match after their mtime moved
+HASHES = "degrees.hashes"
+
+# CompactGraph attributes written as integer arrays
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_stars", "name_order")
+
+# CompactGraph attributes written as string tables
+STRINGS = ("person_ids", "person_names", "person_births",
+           "movie_ids", "movie_titles", "movie_years")
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, "degrees.snapshot")
+
+
+def names_path(directory):
+    return os.path.join(directory, "degrees.names")
+
+
+def fingerprint(directory, hashed=True):
+    """
+    Returns size, mtime and (if `hashed`) SHA-256 of each source CSV.
+    """
+    sources = {}
+    for filename in SOURCES:
+        path = os.path.join(directory, filename)
+        stat = os.stat(path)
+        sources[filename] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if hashed:
+            sources[filename]["sha256"] = file_hash(path)
+    return sources
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_snapshot(graph, directory):
+    """
+    Write `graph` to a binary snapshot in `directory`, stamped with the
+    fingerprint of the CSVs it was built from.
+
+    The file is laid out by `write_sections`: integer arrays as raw int32
+    and string tables as a UTF-8 blob plus an int64 offsets array. The
+    graph's NameIndex is stored as well.
+    """
+    sections = []
+    for name in ARRAYS:
+        sections.append((name, "i", array("i", getattr(graph, name)).tobytes()))
+    for name in STRINGS:
+        sections.extend(_string_sections(name, getattr(graph, name)))
+    # Positions sorted by id, so ids can be found by binary search
+    for name, ids in (("person_id_order", graph.person_ids), ("movie_id_order", graph.movie_ids)):
+        order = array("i", sorted(range(len(ids)), key=ids.__getitem__))
+        sections.append((name, "i", order.tobytes()))
+    sections.extend(_name_index_sections(graph.name_index()))
+
+    header = {"version": VERSION, "sources": fingerprint(directory)}
+    return write_sections(snapshot_path(directory), MAGIC, header, sections)
+
+
+def write_sections(path, magic, header, sections):
+    """
+    Write a binary file of named sections to `path`, replacing it whole.
+
+    The file is `magic`, a little-endian uint32 header length, the JSON
+    `header` with a "sections" entry added giving each section's offset,
+    size and typecode, then the sections themselves, each a (name,
+    typecode, bytes) triple, aligned to 8 bytes.
+    """
+    layout, offset = {}, 0
+    for name, typecode, data in sections:
+        layout[name] = [offset, len(data), typecode]
+        offset += _padded(len(data))
+    header = json.dumps(dict(header, sections=layout)).encode("utf-8")
+    start = _padded(len(magic) + 4 + len(header))
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(magic + struct.pack("<I", len(header)) + header)
+        f.write(bytes(start - f.tell()))
+        for name, typecode, data in sections:
+            f.write(data)
+            f.write(bytes(_padded(len(data)) - len(data)))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def read_sections(path, magic):
+    """
+    Map a file written by `write_sections`. Returns its header and a dict
+    of its sections, each a memoryview cast to its typecode that keeps
+    the mapping alive, or None if there is no file at `path` or it
+    doesn't start with `magic`.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        if os.fstat(f.fileno()).st_size < len(magic) + 4:
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(buffer)
+    if bytes(view[:len(magic)]) != magic:
+        return None
+    (length,) = struct.unpack_from("<I", buffer, len(magic))
+    header = json.loads(bytes(view[len(magic) + 4:len(magic) + 4 + length]))
+    start = _padded(len(magic) + 4 + length)
+    sections = {
+        name: view[start + offset:start + offset + size].cast(typecode)
+        for name, (offset, size, typecode) in header.pop("sections").items()
+    }
+    return header, sections
+
+
+def load_snapshot(directory):
+    """
+    Map the snapshot in `directory` and return a CompactGraph backed by
+    it, or None if there is no snapshot or the CSVs have changed since it
+    was written.
+    """
+    mapped = read_sections(snapshot_path(directory), MAGIC)
+    if mapped is None:
+        return None
+    header, sections = mapped
+    if header["version"] != VERSION or not is_fresh(directory, header["sources"]):
+        return None
+
+    tables = {
+        name: StringTable(sections[f"{name}.blob"], sections[f"{name}.offsets"])
+        for name in STRINGS
+    }
+    return CompactGraph(
+        tables["person_ids"], tables["person_names"], tables["person_births"],
+        tables["movie_ids"], tables["movie_titles"], tables["movie_years"],
+        *(sections[name] for name in ARRAYS),
+        person_index=SortedIndex(tables["person_ids"], sections["person_id_order"]),
+        movie_index=SortedIndex(tables["movie_ids"], sections["movie_id_order"]),
+        name_index=_name_index(sections)
+    )
+
+
+def write_name_index(index, directory):
+    """
+    Write `index` to `degrees.names` in `directory`, laid out as in the
+    snapshot and stamped with the fingerprint of the CSVs, so loading
+    the dataset into dicts needn't rebuild it every time.
+    """
+    header = {"sources": fingerprint(directory)}
+    return write_sections(names_path(directory), NAMES_MAGIC, header, _name_index_sections(index))
+
+
+def load_name_index(directory):
+    """
+    Map the NameIndex in `directory`, or return None if there is none or
+    the CSVs have changed since it was written.
+    """
+    mapped = read_sections(names_path(directory), NAMES_MAGIC)
+    if mapped is None:
+        return None
+    header, sections = mapped
+    if not is_fresh(directory, header["sources"]):
+        return None
+    return _name_index(sections)
+
+
+def is_fresh(directory, sources):
+    """
+    Returns True if the CSVs in `directory` still match `sources`.
+
+    Matching size and mtime is trusted as is; a file whose mtime moved
+    but whose size did not is hashed, so touching a file doesn't force a
+    rebuild but editing it does. A file found unchanged that way has its
+    new mtime and hash noted in `directory`, so it is hashed only once.
+    """
+    try:
+        current = fingerprint(directory, hashed=False)
+    except FileNotFoundError:
+        return False
+    checked = _checked_hashes(directory)
+    noted = False
+    for filename in SOURCES:
+        old, new = sources.get(filename), current[filename]
+        if old is None or old["size"] != new["size"]:
+            return False
+        if old["mtime_ns"] != new["mtime_ns"]:
+            stamp = [new["size"], new["mtime_ns"], old["sha256"]]
+            if checked.get(filename) == stamp:
+                continue
+            if old["sha256"] != file_hash(os.path.join(directory, filename)):
+                return False
+            checked[filename] = stamp
+            noted = True
+    if noted:
+        _note_hashes(directory, checked)
+    return True
+
+
+def _checked_hashes(directory):
+    """
+    Returns the [size, mtime, SHA-256] each CSV was last hashed at, by
+    filename.
+    """
+    try:
+        with open(os.path.join(directory, HASHES)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _note_hashes(directory, checked):
+    path = os.path.join(directory, HASHES)
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(checked, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        # A read-only dataset is hashed again next time
+        pass
+
+
+def _string_sections(name, values):
+    blob, offsets = bytearray(), array("q", [0])
+    for value in values:
+        blob += value.encode("utf-8")
+        offsets.append(len(blob))
+    return [(f"{name}.blob", "B", bytes(blob)), (f"{name}.offsets", "q", offsets.tobytes())]
+
+
+def _name_index_sections(index):
+    sections = _string_sections("name_keys", index.keys) + _string_sections("name_grams", index.grams)
+    sections.append(("name_gram_offsets", "i", array("i", index.offsets).tobytes()))
+    sections.append(("name_postings", "i", array("i", index.postings).tobytes()))
+    sections.append(("name_sizes", "H", array("H", index.sizes).tobytes()))
+    return sections
+
+
+def _name_index(sections):
+    keys, grams = (StringTable(sections[f"{name}.blob"], sections[f"{name}.offsets"])
+                   for name in ("name_keys", "name_grams"))
+    return NameIndex(keys, grams, sections["name_gram_offsets"], sections["name_postings"],
+                     sections["name_sizes"])
+
+
+def _padded(n):
+    return (n + 7) & ~7
+
+
+class StringTable():
+    """
+    Sequence of strings stored as one UTF-8 blob and an offsets array.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class SortedIndex():
+    """
+    Maps keys to positions by binary search over `order`, the positions
+    of `keys` in sorted key order.
+    """
+
+    def __init__(self, keys, order):
+        self.keys = keys
+        self.order = order
+
+    def __getitem__(self, i):
+        return self.keys[self.order[i]]
+
+    def __len__(self):
+        return len(self.order)
+
+    def get(self, key, default=None):
+        i = bisect.bisect_left(self, key)
+        if i < len(self) and self[i] == key:
+            return self.order[i]
+        return default
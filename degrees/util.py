@@ -1,4 +1,11 @@
+import json
+import time
+from collections import deque
+
+
 class Node():
+    __slots__ = ("state", "parent", "action")
+
     def __init__(self, state, parent, action):
         self.state = state
         self.parent = parent
@@ -7,13 +14,16 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+        # How many nodes on the frontier hold each state
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +32,17 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard(node.state)
             return node
 
+    def discard(self, state):
+        count = self.states[state]
+        if count == 1:
+            del self.states[state]
+        else:
+            self.states[state] = count - 1
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +50,64 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard(node.state)
             return node
+
+
+class SearchStats():
+    """
+    Counters for one search, filled in by the profiled frontier, visited
+    set and neighbour lookup. Nothing records into it unless a search is
+    given one.
+    """
+
+    def __init__(self, search="bfs"):
+        self.search = search
+        self.expanded = 0
+        self.generated = 0
+        self.peak_frontier = 0
+        self.neighbor_time = 0.0
+        self.membership_checks = 0
+        self.membership_time = 0.0
+        self.elapsed = 0.0
+        self.length = None
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+class ProfiledQueueFrontier(QueueFrontier):
+    """
+    A QueueFrontier that records its peak size into a SearchStats.
+    """
+
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def add(self, node):
+        super().add(node)
+        if len(self.frontier) > self.stats.peak_frontier:
+            self.stats.peak_frontier = len(self.frontier)
+
+
+class ProfiledSet(set):
+    """
+    A set that records the number of membership checks made on it, and
+    the time they took, into a SearchStats.
+    """
+
+    def __init__(self, items, stats):
+        super().__init__(items)
+        self.stats = stats
+
+    def __contains__(self, item):
+        start = time.perf_counter()
+        found = super().__contains__(item)
+        self.stats.membership_time += time.perf_counter() - start
+        self.stats.membership_checks += 1
+        return found
@@ -0,0 +1,483 @@
+"""
+Benchmarks for the PageRank engines.
+
+Usage:
+    python benchmark.py sparse [--dict-max N] [--max-pages N] [--links K]
+    python benchmark.py sampling [--pages N] [--samples N] [--links K]
+    python benchmark.py parallel [--pages N] [--samples N] [--links K] [--walkers N]
+    python benchmark.py incremental [--pages N] [--links K] [--changes N] [--rounds N]
+    python benchmark.py crawl DIRECTORY [--pages N] [--links K] [--processes N]
+    python benchmark.py convergence [--pages N] [--links K]
+    python benchmark.py personalized [--pages N] [--links K] [--vectors N]
+    python benchmark.py suite OUTPUT.json [--sizes N ...] [--links K] [--samples N] [--dict-max N]
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+from crawlcache import cache_path, cached_crawl
+from crawler import parallel_crawl
+from incremental import IncrementalPageRank
+from pagerank import DAMPING, crawl, iterate_pagerank, sample_pagerank
+from sampling import parallel_sample_pagerank, vector_sample_pagerank
+from sparse import (SCHEMES, LinkMatrix, NotConverged, personalized_pagerank, power_iteration,
+                    residual, solve, sparse_pagerank)
+
+
+def random_edges(n, links, rng):
+    """
+    Returns (sources, targets) arrays for `n` pages with `links` random
+    outbound links each on average, without self links.
+    """
+    sources = np.repeat(np.arange(n), rng.poisson(links, n))
+    targets = rng.integers(0, n - 1, len(sources))
+    targets[targets >= sources] += 1
+    # Drop repeated links, as a crawled corpus holds sets
+    edges = np.unique(sources * n + targets)
+    return edges // n, edges % n
+
+
+def chain_edges(n):
+    """
+    Returns (sources, targets) arrays for a chain of `n` pages, each
+    linking to the next, which mixes about as slowly as a graph can.
+    """
+    sources = np.arange(n - 1)
+    return sources, sources + 1
+
+
+def clustered_edges(n, links, rng, clusters=10, bridges=0.001):
+    """
+    Returns (sources, targets) arrays for `n` pages in `clusters` groups,
+    with `links` outbound links each on average, all but a `bridges`
+    share of them within the page's own group. So few links between the
+    groups make the graph nearly reducible: rank moves between them
+    slowly, and power iteration converges slowly once damping is near 1.
+    """
+    sources = np.repeat(np.arange(n), rng.poisson(links, n))
+    size = -(-n // clusters)
+    targets = np.minimum(sources // size * size + rng.integers(0, size, len(sources)), n - 1)
+    far = rng.random(len(sources)) < bridges
+    targets[far] = rng.integers(0, n, far.sum())
+    kept = sources != targets
+    edges = np.unique(sources[kept] * n + targets[kept])
+    return edges // n, edges % n
+
+
+def scale_free_edges(n, links, rng, exponent=2.1):
+    """
+    Returns (sources, targets) arrays for `n` pages with `links` outbound
+    links each on average, whose inbound link counts follow a power law
+    with the given exponent, as on the web: a few pages are linked to by
+    a large share of all the others.
+    """
+    sources = np.repeat(np.arange(n), rng.poisson(links, n))
+    weights = np.arange(1, n + 1) ** (-1 / (exponent - 1))
+    popular = rng.permutation(n)
+    targets = popular[rng.choice(n, len(sources), p=weights / weights.sum())]
+    edges = np.unique(sources[sources != targets] * n + targets[sources != targets])
+    return edges // n, edges % n
+
+
+def dangling_edges(n, links, rng, fraction=0.5):
+    """
+    Returns (sources, targets) arrays as `random_edges` does, but with
+    `fraction` of the pages linking nowhere.
+    """
+    sources, targets = random_edges(n, links, rng)
+    dangling = rng.random(n) < fraction
+    kept = ~dangling[sources]
+    return sources[kept], targets[kept]
+
+
+def random_corpus(n, links, rng):
+    """
+    Returns a crawl()-style corpus of `n` pages named "0.html" onwards.
+    """
+    return edge_corpus(n, *random_edges(n, links, rng))
+
+
+def edge_corpus(n, sources, targets):
+    """
+    Returns a crawl()-style corpus of `n` pages named "0.html" onwards,
+    with links from `sources[i]` to `targets[i]`.
+    """
+    corpus = {f"{i}.html": set() for i in range(n)}
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        corpus[f"{source}.html"].add(f"{target}.html")
+    return corpus
+
+
+def write_corpus(directory, corpus):
+    """
+    Write `corpus` as HTML pages in `directory`, laid out like the pages
+    of corpus0.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for page, links in corpus.items():
+        items = "".join(f"            <li><a href=\"{link}\">{link[:-5]}</a></li>\n" for link in sorted(links))
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(
+                "<!DOCTYPE html>\n<html lang=\"en\">\n    <head>\n"
+                f"        <title>{page[:-5]}</title>\n    </head>\n    <body>\n"
+                f"        <h1>{page[:-5]}</h1>\n\n        <div>Links:</div>\n"
+                f"        <ul>\n{items}        </ul>\n    </body>\n</html>\n"
+            )
+
+
+def bench_sparse(dict_max, max_pages, links, seed=0):
+    """
+    Time iterate_pagerank against the sparse engine on random corpora of
+    growing size, then the sparse engine alone up to `max_pages`. Error
+    is the L1 distance from a tightly converged sparse solve.
+    """
+    rng = np.random.default_rng(seed)
+    print(f"{'pages':>9}{'engine':>9}{'build (s)':>11}{'solve (s)':>11}{'iterations':>12}{'L1 error':>11}")
+    n = 100
+    while n <= max_pages:
+        if n <= dict_max:
+            corpus = random_corpus(n, links, rng)
+            matrix = LinkMatrix.from_corpus(corpus)
+            reference, _ = power_iteration(matrix, DAMPING, tolerance=1e-14)
+            reference = matrix.to_dict(reference)
+            for label, engine in (("dict", iterate_pagerank), ("sparse", sparse_pagerank)):
+                start = time.perf_counter()
+                ranks = engine(corpus, DAMPING)
+                elapsed = time.perf_counter() - start
+                error = sum(abs(ranks[page] - reference[page]) for page in corpus)
+                print(f"{n:>9}{label:>9}{'':>11}{elapsed:>11.3f}{'':>12}{error:>11.2e}")
+        else:
+            # Too big for a dict of sets to be worth building; go straight
+            # from edge arrays
+            sources, targets = random_edges(n, links, rng)
+            start = time.perf_counter()
+            matrix = LinkMatrix.from_edges(range(n), sources, targets)
+            built = time.perf_counter() - start
+            start = time.perf_counter()
+            _, iterations = power_iteration(matrix, DAMPING)
+            solved = time.perf_counter() - start
+            print(f"{n:>9}{'sparse':>9}{built:>11.3f}{solved:>11.3f}{iterations:>12}{'':>11}")
+        n *= 10
+
+
+def bench_sampling(pages, samples, links, seed=0):
+    """
+    Time sample_pagerank against the vectorised sampler with one and with
+    many walkers, reporting samples per second and the largest error
+    against power iteration.
+    """
+    rng = np.random.default_rng(seed)
+    corpus = random_corpus(pages, links, rng)
+    reference = sparse_pagerank(corpus, DAMPING)
+    samplers = (
+        ("dict", lambda: sample_pagerank(corpus, DAMPING, samples)),
+        ("vector", lambda: vector_sample_pagerank(corpus, DAMPING, samples, seed=seed)),
+        ("vector x1000", lambda: vector_sample_pagerank(corpus, DAMPING, samples, 1000, seed)),
+    )
+    print(f"{'sampler':<14}{'time (s)':>10}{'samples/s':>12}{'max error':>11}")
+    for label, sample in samplers:
+        start = time.perf_counter()
+        ranks = sample()
+        elapsed = time.perf_counter() - start
+        error = max(abs(ranks[page] - reference[page]) for page in corpus)
+        print(f"{label:<14}{elapsed:>10.2f}{samples / elapsed:>12.0f}{error:>11.2e}")
+
+
+def bench_parallel(pages, samples, links, walkers, seed=0):
+    """
+    Time the parallel sampler with 1, 2, 4... processes up to the number
+    of cores, reporting samples per second, speedup over one process and
+    the widest confidence interval.
+    """
+    rng = np.random.default_rng(seed)
+    corpus = random_corpus(pages, links, rng)
+    cores = os.cpu_count() or 1
+    print(f"{'processes':>9}{'time (s)':>10}{'samples/s':>12}{'speedup':>9}{'widest CI':>11}")
+    processes, base = 1, None
+    while True:
+        start = time.perf_counter()
+        _, intervals = parallel_sample_pagerank(corpus, DAMPING, samples, processes,
+                                                walkers=walkers, seed=seed)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        widest = max(high - low for low, high in intervals.values())
+        print(f"{processes:>9}{elapsed:>10.2f}{samples / elapsed:>12.0f}"
+              f"{base / elapsed:>9.2f}{widest:>11.2e}")
+        if processes >= cores:
+            break
+        processes = min(processes * 2, cores)
+
+
+def bench_incremental(pages, links, changes, rounds, seed=0):
+    """
+    Apply rounds of random link changes to a corpus, timing each
+    incremental update against ranking the changed corpus from scratch
+    and reporting the L1 distance between the two.
+    """
+    rng = np.random.default_rng(seed)
+    corpus = random_corpus(pages, links, rng)
+    ranked = IncrementalPageRank(corpus, DAMPING)
+    names = list(corpus)
+    print(f"{'round':>5}{'update (s)':>12}{'iterations':>12}{'full (s)':>10}{'iterations':>12}{'L1 distance':>13}")
+    for round in range(rounds):
+        added = [(names[a], names[b]) for a, b in rng.integers(0, pages, (changes, 2)) if a != b]
+        removed = [(page, min(corpus[page])) for page in rng.choice(names, changes) if corpus[page]]
+        for page, link in removed:
+            corpus[page].discard(link)
+        for page, link in added:
+            corpus[page].add(link)
+
+        start = time.perf_counter()
+        iterations = ranked.update(add_links=added, remove_links=removed)
+        updated = time.perf_counter() - start
+        start = time.perf_counter()
+        matrix = LinkMatrix.from_corpus(corpus)
+        ranks, full_iterations = power_iteration(matrix, DAMPING)
+        full = time.perf_counter() - start
+        distance = np.abs(ranked.vector - ranks).sum()
+        print(f"{round:>5}{updated:>12.3f}{iterations:>12}{full:>10.3f}{full_iterations:>12}{distance:>13.2e}")
+
+
+def bench_crawl(directory, pages, links, processes, seed=0):
+    """
+    Time crawl against the chunked parallel crawler and the cached crawl,
+    cold and warm, on a synthetic HTML corpus in `directory`, written
+    first if it holds no pages.
+    """
+    if not os.path.isdir(directory) or not any(name.endswith(".html") for name in os.listdir(directory)):
+        write_corpus(directory, random_corpus(pages, links, np.random.default_rng(seed)))
+    if os.path.exists(cache_path(directory)):
+        os.remove(cache_path(directory))
+    crawlers = [
+        ("crawl", lambda: crawl(directory)),
+        ("cache cold", lambda: cached_crawl(directory)),
+        ("cache warm", lambda: cached_crawl(directory)),
+    ]
+    count = 1
+    while True:
+        crawlers.append((f"parallel x{count}", lambda count=count: parallel_crawl(directory, count)))
+        if count >= processes:
+            break
+        count = min(count * 2, processes)
+    print(f"{'crawler':<14}{'time (s)':>10}{'pages/s':>10}")
+    expected = None
+    for label, crawler in crawlers:
+        start = time.perf_counter()
+        corpus = crawler()
+        elapsed = time.perf_counter() - start
+        expected = expected or corpus
+        same = "" if corpus == expected else "  differs from crawl"
+        print(f"{label:<14}{elapsed:>10.2f}{len(corpus) / elapsed:>10.0f}{same}")
+
+
+def bench_convergence(pages, links, seed=0):
+    """
+    Compare the convergence schemes on a random graph, a chain and a
+    clustered graph, at the usual damping factor and at ones close to 1,
+    where power iteration converges slowly. Residual is the L1 change one
+    more power step would make; runs that hit the iteration limit are
+    marked as not converged.
+    """
+    rng = np.random.default_rng(seed)
+    graphs = (
+        ("random", random_edges(pages, links, rng)),
+        ("chain", chain_edges(pages)),
+        ("cluster", clustered_edges(pages, links, rng)),
+    )
+    print(f"{'graph':<8}{'damping':>8}{'scheme':>14}{'iterations':>12}{'converged':>11}"
+          f"{'time (s)':>10}{'residual':>11}{'L1 error':>11}")
+    for label, (sources, targets) in graphs:
+        matrix = LinkMatrix.from_edges(range(pages), sources, targets)
+        for damping_factor in (DAMPING, 0.99, 0.999):
+            reference, _ = power_iteration(matrix, damping_factor, 1e-14, max_iterations=10 ** 6)
+            for scheme in SCHEMES:
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter("always", NotConverged)
+                    start = time.perf_counter()
+                    ranks, iterations = solve(matrix, damping_factor, scheme)
+                    elapsed = time.perf_counter() - start
+                converged = "no" if any(w.category is NotConverged for w in caught) else "yes"
+                error = np.abs(ranks - reference).sum()
+                print(f"{label:<8}{damping_factor:>8}{scheme:>14}{iterations:>12}{converged:>11}"
+                      f"{elapsed:>10.3f}{residual(matrix, damping_factor, ranks):>11.2e}{error:>11.2e}")
+
+
+def bench_personalized(pages, links, vectors, seed=0):
+    """
+    Time personalised PageRank for `vectors` random single-page teleport
+    vectors, batched into one iteration against one vector at a time.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = LinkMatrix.from_edges(range(pages), *random_edges(pages, links, rng))
+    teleports = np.zeros((pages, vectors))
+    teleports[rng.choice(pages, vectors, replace=False), np.arange(vectors)] = 1
+
+    start = time.perf_counter()
+    batched, iterations = personalized_pagerank(matrix, DAMPING, teleports)
+    batch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    separate = np.column_stack([
+        personalized_pagerank(matrix, DAMPING, teleports[:, [column]])[0][:, 0]
+        for column in range(vectors)
+    ])
+    separate_time = time.perf_counter() - start
+    difference = np.abs(batched - separate).sum(axis=0).max()
+    print(f"{'mode':<10}{'time (s)':>10}{'per vector (ms)':>17}")
+    print(f"{'batched':<10}{batch_time:>10.3f}{batch_time / vectors * 1000:>17.2f}")
+    print(f"{'separate':<10}{separate_time:>10.3f}{separate_time / vectors * 1000:>17.2f}")
+    print(f"{iterations} iterations batched, largest L1 difference {difference:.2e}")
+
+
+SUITE_GRAPHS = {
+    "random": lambda n, links, rng: random_edges(n, links, rng),
+    "scale-free": lambda n, links, rng: scale_free_edges(n, links, rng),
+    "dangling": lambda n, links, rng: dangling_edges(n, links, rng),
+    "clustered": lambda n, links, rng: clustered_edges(n, links, rng),
+    "chain": lambda n, links, rng: chain_edges(n),
+}
+
+
+def bench_suite(output, sizes, links, samples, dict_max, seed=0):
+    """
+    Run every engine on each kind of synthetic graph at each size in
+    `sizes`, recording wall time, peak memory and error, and write the
+    results to `output` as JSON so runs can be compared over time.
+
+    Error is against a power iteration converged to 1e-15 in L1. Peak
+    memory is the largest amount NumPy and Python allocated during a
+    second, traced run, so tracing doesn't slow the timed one; it covers
+    this process only, not the parallel sampler's workers. The dict
+    engines only run on graphs of up to `dict_max` pages.
+    """
+    engines = [
+        ("sample_pagerank", True, lambda corpus: sample_pagerank(corpus, DAMPING, samples)),
+        ("iterate_pagerank", True, lambda corpus: iterate_pagerank(corpus, DAMPING)),
+        ("vector sampler", False,
+         lambda corpus: vector_sample_pagerank(corpus, DAMPING, samples, 1000, seed)),
+        ("parallel sampler", False,
+         lambda corpus: parallel_sample_pagerank(corpus, DAMPING, samples, seed=seed)[0]),
+    ]
+    for scheme in SCHEMES:
+        engines.append((f"sparse {scheme}", False,
+                        lambda corpus, scheme=scheme: sparse_pagerank(corpus, DAMPING, scheme=scheme)))
+
+    results = []
+    print(f"{'graph':<11}{'pages':>8}{'engine':>20}{'time (s)':>10}{'peak (MB)':>11}"
+          f"{'L1 error':>11}{'max error':>11}")
+    for n in sizes:
+        for graph, edges in SUITE_GRAPHS.items():
+            sources, targets = edges(n, links, np.random.default_rng(seed))
+            corpus = edge_corpus(n, sources, targets)
+            matrix = LinkMatrix.from_edges(list(corpus), sources, targets)
+            reference, _ = power_iteration(matrix, DAMPING, 1e-15, max_iterations=100000)
+            for label, small_only, engine in engines:
+                if small_only and n > dict_max:
+                    continue
+                start = time.perf_counter()
+                ranks = engine(corpus)
+                elapsed = time.perf_counter() - start
+                tracemalloc.start()
+                engine(corpus)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                errors = np.abs(np.array([ranks[page] for page in matrix.pages]) - reference)
+                results.append({
+                    "graph": graph, "pages": n, "links": len(sources), "engine": label,
+                    "time": elapsed, "peak_memory": peak,
+                    "l1_error": float(errors.sum()), "max_error": float(errors.max()),
+                })
+                print(f"{graph:<11}{n:>8}{label:>20}{elapsed:>10.3f}{peak / 2 ** 20:>11.1f}"
+                      f"{errors.sum():>11.2e}{errors.max():>11.2e}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "cores": os.cpu_count(),
+        "damping_factor": DAMPING,
+        "samples": samples,
+        "seed": seed,
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("sparse", help="dict iteration against the sparse engine")
+    command.add_argument("--dict-max", type=int, default=1000)
+    command.add_argument("--max-pages", type=int, default=10 ** 6)
+    command.add_argument("--links", type=float, default=8)
+
+    command = commands.add_parser("sampling", help="sample_pagerank against the vector sampler")
+    command.add_argument("--pages", type=int, default=100)
+    command.add_argument("--samples", type=int, default=100000)
+    command.add_argument("--links", type=float, default=8)
+
+    command = commands.add_parser("parallel", help="parallel sampler scaling with processes")
+    command.add_argument("--pages", type=int, default=10000)
+    command.add_argument("--samples", type=int, default=10 ** 7)
+    command.add_argument("--links", type=float, default=8)
+    command.add_argument("--walkers", type=int, default=1000)
+
+    command = commands.add_parser("incremental", help="incremental updates against recomputing")
+    command.add_argument("--pages", type=int, default=100000)
+    command.add_argument("--links", type=float, default=8)
+    command.add_argument("--changes", type=int, default=10)
+    command.add_argument("--rounds", type=int, default=5)
+
+    command = commands.add_parser("crawl", help="crawl against the parallel crawler")
+    command.add_argument("directory")
+    command.add_argument("--pages", type=int, default=100000)
+    command.add_argument("--links", type=float, default=8)
+    command.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+
+    command = commands.add_parser("convergence", help="iterations and time per convergence scheme")
+    command.add_argument("--pages", type=int, default=10000)
+    command.add_argument("--links", type=float, default=8)
+
+    command = commands.add_parser("personalized", help="batched against separate personalised PageRank")
+    command.add_argument("--pages", type=int, default=100000)
+    command.add_argument("--links", type=float, default=8)
+    command.add_argument("--vectors", type=int, default=64)
+
+    command = commands.add_parser("suite", help="every engine on every kind of graph, saved as JSON")
+    command.add_argument("output")
+    command.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    command.add_argument("--links", type=float, default=8)
+    command.add_argument("--samples", type=int, default=100000)
+    command.add_argument("--dict-max", type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.command == "sparse":
+        bench_sparse(args.dict_max, args.max_pages, args.links)
+    elif args.command == "sampling":
+        bench_sampling(args.pages, args.samples, args.links)
+    elif args.command == "parallel":
+        bench_parallel(args.pages, args.samples, args.links, args.walkers)
+    elif args.command == "incremental":
+        bench_incremental(args.pages, args.links, args.changes, args.rounds)
+    elif args.command == "crawl":
+        bench_crawl(args.directory, args.pages, args.links, args.processes)
+    elif args.command == "convergence":
+        bench_convergence(args.pages, args.links)
+    elif args.command == "personalized":
+        bench_personalized(args.pages, args.links, args.vectors)
+    elif args.command == "suite":
+        bench_suite(args.output, args.sizes, args.links, args.samples, args.dict_max)
+
+
+if __name__ == "__main__":
+    main()
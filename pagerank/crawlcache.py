@@ -0,0 +1,201 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from crawler import CHUNK_SIZE, iter_links
+
+MAGIC = b"PRCRAWL1"
+VERSION = 1
+
+
+def cache_path(directory):
+    return os.path.join(directory, "pagerank.cache")
+
+
+def cached_crawl(directory, processes=1, chunk_size=CHUNK_SIZE):
+    """
+    Return the same corpus as `crawl`, keeping the links found in each
+    file in a cache in `directory`, keyed by filename, size and mtime.
+
+    Only files that are new or have changed since the cache was written
+    are parsed. If none have, the corpus is read straight from the
+    resolved graph stored in the cache and nothing is parsed at all.
+    """
+    files = {}
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".html"):
+            stat = entry.stat()
+            files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+
+    cache = load_cache(directory)
+    if cache is not None and cache.matches(files):
+        return cache.corpus()
+
+    # Reuse the raw links of unchanged files, and parse the rest
+    raw = {}
+    changed = []
+    cached = {} if cache is None else cache.stats()
+    for filename, stat in files.items():
+        if cached.get(filename) == stat:
+            raw[filename] = None
+        else:
+            changed.append(filename)
+    if cache is not None and len(raw) > 0:
+        for filename, links in cache.raw_links(raw):
+            raw[filename] = links
+    for filename, links in iter_links(directory, processes, chunk_size, changed):
+        raw[filename] = links
+
+    corpus = resolve(raw)
+    write_cache(directory, files, raw, corpus)
+    return corpus
+
+
+def resolve(raw):
+    """
+    Turn raw link sets into a corpus, as `crawl` does: no page links to
+    itself, and only links to other pages in the corpus are kept.
+    """
+    names = set(raw)
+    corpus = {}
+    for filename, links in raw.items():
+        corpus[filename] = links & names
+        corpus[filename].discard(filename)
+    return corpus
+
+
+def write_cache(directory, files, raw, corpus):
+    """
+    Write the file stats, raw links and resolved `corpus` of a crawl to
+    the cache in `directory`.
+
+    The file is MAGIC, a little-endian uint32 header length, a JSON header
+    describing each section, then the sections, each aligned to 8 bytes.
+    Page names and raw links are NUL-separated UTF-8, with a row pointer
+    array giving each page's run of raw links, and the resolved graph is
+    a row pointer and an index array over page positions.
+    """
+    names = sorted(raw)
+    position = {name: i for i, name in enumerate(names)}
+    sizes = np.array([files[name][0] for name in names], dtype=np.int64)
+    mtimes = np.array([files[name][1] for name in names], dtype=np.int64)
+
+    links, link_ptr = [], [0]
+    graph, graph_ptr = [], [0]
+    for name in names:
+        # A NUL can't be stored; such a link can't name a page anyway
+        links.extend(link for link in raw[name] if "\0" not in link)
+        link_ptr.append(len(links))
+        graph.extend(map(position.__getitem__, corpus[name]))
+        graph_ptr.append(len(graph))
+
+    sections = [
+        ("names", "S", "\0".join(names).encode("utf-8")),
+        ("sizes", "i8", sizes.tobytes()),
+        ("mtimes", "i8", mtimes.tobytes()),
+        ("links", "S", "\0".join(links).encode("utf-8")),
+        ("link_ptr", "i8", np.array(link_ptr, dtype=np.int64).tobytes()),
+        ("graph", "i4", np.array(graph, dtype=np.int32).tobytes()),
+        ("graph_ptr", "i8", np.array(graph_ptr, dtype=np.int64).tobytes()),
+    ]
+    layout, offset = {}, 0
+    for name, dtype, data in sections:
+        layout[name] = [offset, len(data), dtype]
+        offset += _padded(len(data))
+    header = json.dumps({"version": VERSION, "pages": len(names), "sections": layout}).encode("utf-8")
+    start = _padded(len(MAGIC) + 4 + len(header))
+
+    path = cache_path(directory)
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(bytes(start - f.tell()))
+        for name, dtype, data in sections:
+            f.write(data)
+            f.write(bytes(_padded(len(data)) - len(data)))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_cache(directory):
+    """
+    Read the crawl cache in `directory`, or return None if there is none
+    or it can't be read.
+    """
+    try:
+        with open(cache_path(directory), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < len(MAGIC) + 4 or data[:len(MAGIC)] != MAGIC:
+        return None
+    (length,) = struct.unpack_from("<I", data, len(MAGIC))
+    header = json.loads(data[len(MAGIC) + 4:len(MAGIC) + 4 + length])
+    if header["version"] != VERSION:
+        return None
+    start = _padded(len(MAGIC) + 4 + length)
+
+    sections = {}
+    for name, (offset, size, dtype) in header["sections"].items():
+        chunk = memoryview(data)[start + offset:start + offset + size]
+        sections[name] = bytes(chunk) if dtype == "S" else np.frombuffer(chunk, dtype=dtype)
+    return CrawlCache(header["pages"], sections)
+
+
+def _padded(n):
+    return (n + 7) & ~7
+
+
+class CrawlCache():
+    """
+    Contents of a crawl cache, decoded only as far as they are asked for.
+    """
+
+    def __init__(self, pages, sections):
+        self.names = _split(sections["names"], pages)
+        self.sections = sections
+
+    def stats(self):
+        """
+        Returns a dict of filename -> (size, mtime in ns).
+        """
+        sizes = self.sections["sizes"].tolist()
+        mtimes = self.sections["mtimes"].tolist()
+        return {name: stat for name, stat in zip(self.names, zip(sizes, mtimes))}
+
+    def matches(self, files):
+        """
+        Returns True if `files`, a dict of filename -> (size, mtime in
+        ns), is exactly the set of files the cache was written from.
+        """
+        return len(files) == len(self.names) and self.stats() == files
+
+    def corpus(self):
+        """
+        Returns the resolved corpus, without touching the raw links.
+        """
+        names = self.names
+        graph = self.sections["graph"].tolist()
+        bounds = self.sections["graph_ptr"].tolist()
+        page = names.__getitem__
+        return {
+            name: set(map(page, graph[bounds[i]:bounds[i + 1]]))
+            for i, name in enumerate(names)
+        }
+
+    def raw_links(self, wanted):
+        """
+        Yields (filename, set of raw links) for each cached file in
+        `wanted`.
+        """
+        links = _split(self.sections["links"], int(self.sections["link_ptr"][-1]))
+        bounds = self.sections["link_ptr"].tolist()
+        for i, name in enumerate(self.names):
+            if name in wanted:
+                yield name, set(links[bounds[i]:bounds[i + 1]])
+
+
+def _split(blob, count):
+    # "".split gives [""], where no strings at all were stored
+    return blob.decode("utf-8").split("\0") if count else []
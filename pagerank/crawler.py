@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import re
+
+# The link pattern crawl() uses, and the start of a tag it could match,
+# over raw bytes so files needn't be decoded
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+OPEN = re.compile(rb"<(?:a(?:\s|\Z)|\Z)")
+
+CHUNK_SIZE = 1 << 16
+
+
+def extract_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Returns the set of href values of the links in the HTML file at
+    `path`, reading it `chunk_size` bytes at a time.
+
+    A link split between two chunks is carried over into the next one,
+    so the result is the same as matching the whole file at once.
+    """
+    links = set()
+    carry = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            text = carry + chunk
+            # A short read means the end of the file, with nothing to carry
+            if len(chunk) < chunk_size:
+                links.update(LINK.findall(text))
+                return set(map(bytes.decode, links))
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            carry = text[_unfinished(text, end):]
+
+
+def _unfinished(text, start):
+    """
+    Returns the position of the first tag in `text[start:]` that could
+    still turn into a link once more text arrives, or len(text).
+    """
+    for tag in OPEN.finditer(text, start):
+        p = tag.start()
+        close = text.find(b">", p)
+        href = text.find(b"href=\"", p, len(text) if close == -1 else close)
+        if href != -1:
+            # Only a link whose closing quote hasn't arrived is left over
+            if text.find(b"\"", href + 6) == -1:
+                return p
+        elif close == -1:
+            return p
+    return len(text)
+
+
+def _extract(task):
+    directory, filename, chunk_size = task
+    return filename, extract_links(os.path.join(directory, filename), chunk_size)
+
+
+def iter_links(directory, processes=None, chunk_size=CHUNK_SIZE, filenames=None):
+    """
+    Yields (filename, set of links) for each HTML file in `directory`, or
+    each of `filenames` if given, as soon as each is parsed, with files
+    spread over `processes` worker processes (default: one per core).
+    Order is not kept.
+    """
+    if filenames is None:
+        filenames = [entry.name for entry in os.scandir(directory) if entry.name.endswith(".html")]
+    tasks = [(directory, filename, chunk_size) for filename in filenames]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(tasks) <= 1:
+        yield from map(_extract, tasks)
+        return
+    chunksize = max(1, len(tasks) // (processes * 16))
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(_extract, tasks, chunksize)
+
+
+def parallel_crawl(directory, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Return the same corpus as `crawl`, parsing files in parallel and in
+    chunks.
+    """
+    pages = dict()
+    for filename, links in iter_links(directory, processes, chunk_size):
+        pages[filename] = links - {filename}
+
+    # Only include links to other pages in the corpus
+    names = pages.keys()
+    for filename in pages:
+        pages[filename] = pages[filename] & names
+
+    return pages
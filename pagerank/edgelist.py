@@ -0,0 +1,177 @@
+"""
+Edge-list graphs for PageRank, as an alternative to directories of HTML.
+
+Usage:
+    python edgelist.py convert EDGES.tsv OUTPUT.edges
+
+A TSV edge list has one "source<TAB>target" line per link, both page
+numbers counted from 0; lines starting with "#" are skipped. The binary
+format is MAGIC, the page and link counts as little-endian uint64s, then
+every source and then every target as int32, so it can be mapped and used
+without parsing. Page names, if any, live in a side table: a text file
+whose line i names page i.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from sparse import LinkMatrix
+
+MAGIC = b"PREDGES1"
+HEADER = struct.Struct("<8sQQ")
+
+# Bytes of TSV parsed at a time
+CHUNK_SIZE = 1 << 24
+
+
+def write_edges(path, pages, sources, targets):
+    """
+    Write a binary edge list of `pages` pages with links from
+    `sources[i]` to `targets[i]`.
+    """
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, pages, len(sources)))
+        f.write(np.asarray(sources, dtype="<i4").tobytes())
+        f.write(np.asarray(targets, dtype="<i4").tobytes())
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def read_binary(path):
+    """
+    Map a binary edge list. Returns the page count and read-only source
+    and target arrays backed by the file.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, pages, edges = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a binary edge list")
+    sources = np.frombuffer(buffer, dtype="<i4", count=edges, offset=HEADER.size)
+    targets = np.frombuffer(buffer, dtype="<i4", count=edges, offset=HEADER.size + 4 * edges)
+    return pages, sources, targets
+
+
+def read_tsv(path, chunk_size=CHUNK_SIZE):
+    """
+    Parse a TSV edge list a chunk at a time with NumPy, never making a
+    Python object per line. Returns the page count (the largest page
+    number plus one) and int32 source and target arrays.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    parts = []
+    start = 0
+    while start < len(buffer):
+        # Cut each chunk after a newline, so no line is split
+        end = min(start + chunk_size, len(buffer))
+        if end < len(buffer):
+            end = buffer.find(b"\n", end) + 1 or len(buffer)
+        numbers = _numbers(np.frombuffer(buffer, dtype=np.uint8, count=end - start, offset=start))
+        if len(numbers) % 2:
+            raise ValueError(f"{path}: expected two page numbers per line")
+        parts.append(numbers.astype(np.int32))
+        start = end
+    numbers = np.concatenate(parts)
+    sources, targets = numbers[0::2], numbers[1::2]
+    pages = int(numbers.max()) + 1 if len(numbers) else 0
+    return pages, sources, targets
+
+
+def _numbers(data):
+    """
+    Returns the unsigned integers written in `data`, an array of bytes,
+    in order, leaving out lines starting with "#".
+    """
+    digit = (data >= ord("0")) & (data <= ord("9"))
+    comments = np.flatnonzero(data == ord("#"))
+    if len(comments):
+        # Blank out every line whose first byte is "#"
+        line = np.cumsum(data == ord("\n"))
+        line_starts = np.r_[0, np.flatnonzero(data == ord("\n")) + 1]
+        first = comments[comments == line_starts[line[comments]]]
+        digit &= ~np.isin(line, line[first])
+    before = np.r_[False, digit[:-1]]
+    after = np.r_[digit[1:], False]
+    starts = np.flatnonzero(digit & ~before)
+    lengths = np.flatnonzero(digit & ~after) + 1 - starts
+    values = np.zeros(len(starts), dtype=np.int64)
+    for place in range(int(lengths.max()) if len(lengths) else 0):
+        more = lengths > place
+        values[more] = values[more] * 10 + (data[starts[more] + place] - ord("0"))
+    return values
+
+
+def read_edges(path):
+    """
+    Read an edge list in either format, telling them apart by MAGIC.
+    """
+    with open(path, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    return read_binary(path) if binary else read_tsv(path)
+
+
+def load_matrix(path, names=None):
+    """
+    Build a LinkMatrix from the edge list at `path`. Self links are
+    dropped; a link listed twice counts twice. Pages are named by the
+    side table at `names` if given, or else by number.
+    """
+    pages, sources, targets = read_edges(path)
+    distinct = sources != targets
+    if not distinct.all():
+        sources, targets = sources[distinct], targets[distinct]
+    table = range(pages) if names is None else NameTable(names)
+    if len(table) < pages:
+        raise ValueError(f"{names}: names {len(table)} pages, but the edge list has {pages}")
+    return LinkMatrix.from_edges(table, sources, targets)
+
+
+class NameTable():
+    """
+    Page names in a mapped text file, one per line, decoded only when
+    asked for.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+                if os.fstat(f.fileno()).st_size else b""
+        data = np.frombuffer(self.buffer, dtype=np.uint8)
+        ends = np.flatnonzero(data == ord("\n"))
+        if len(data) and data[-1] != ord("\n"):
+            ends = np.r_[ends, len(data)]
+        self.ends = ends
+        self.starts = np.r_[0, ends[:-1] + 1]
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.buffer[self.starts[i]:self.ends[i]].decode("utf-8").rstrip("\r")
+
+    def __len__(self):
+        return len(self.ends)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("convert", help="write a TSV edge list in binary form")
+    command.add_argument("tsv")
+    command.add_argument("output")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        pages, sources, targets = read_tsv(args.tsv)
+        write_edges(args.output, pages, sources, targets)
+        print(f"{pages} pages, {len(sources)} links written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+
+from sparse import LinkMatrix, power_iteration
+
+
+class IncrementalPageRank():
+    """
+    PageRank of a corpus that changes a few pages at a time.
+
+    Each change edits the CSR link matrix rather than rebuilding it from
+    a corpus dict: links are deleted from and inserted into its arrays in
+    one pass each, which still copies them, so an update is O(links).
+    Power iteration then runs over the whole graph again, but restarts
+    from the previous ranks rather than from the uniform vector, so a
+    small change takes few iterations.
+    """
+
+    def __init__(self, corpus, damping_factor, tolerance=1e-10):
+        self.damping_factor = damping_factor
+        self.tolerance = tolerance
+        self.matrix = LinkMatrix.from_corpus(corpus)
+        self.position = {page: i for i, page in enumerate(self.matrix.pages)}
+        self.vector, self.iterations = power_iteration(self.matrix, damping_factor, tolerance)
+
+    def ranks(self):
+        return self.matrix.to_dict(self.vector)
+
+    def update(self, add_links=(), remove_links=(), add_pages=(), remove_pages=()):
+        """
+        Apply a change to the corpus and bring the ranks up to date.
+
+        `add_links` and `remove_links` hold (page, linked page) pairs;
+        pages named in `add_links` that are not yet in the corpus are
+        added, as are `add_pages`. Links are removed before any are added.
+        Removing a page removes its links and every link to it.
+
+        Returns the number of iterations the update took.
+        """
+        matrix = self.matrix
+        pages = list(matrix.pages)
+        indptr, indices = matrix.indptr, matrix.indices
+        out_degree = matrix.out_degree
+        ranks = self.vector
+
+        # New pages go on the end with no links yet, so existing positions
+        # only move when pages are removed
+        new = []
+        for page in list(add_pages) + [page for link in add_links for page in link]:
+            if page not in self.position:
+                self.position[page] = len(pages)
+                pages.append(page)
+                new.append(page)
+        if new:
+            indptr = np.concatenate([indptr, np.full(len(new), indptr[-1])])
+            out_degree = np.concatenate([out_degree, np.zeros(len(new), dtype=out_degree.dtype)])
+            ranks = np.concatenate([ranks, np.full(len(new), 1 / len(pages))])
+        out_degree = out_degree.copy()
+
+        # Row t of the matrix lists the sources of links to t
+        dropped = {}
+        for source, target in self._links(remove_links):
+            start = indptr[target]
+            found = np.flatnonzero(indices[start:indptr[target + 1]] == source)
+            if len(found) and (source, target) not in dropped:
+                dropped[source, target] = start + found[0]
+                out_degree[source] -= 1
+        added = {}
+        for source, target in self._links(add_links):
+            linked = source in indices[indptr[target]:indptr[target + 1]]
+            if (source, target) in dropped:
+                # Removed and added back in the same change
+                out_degree[source] += 1
+                del dropped[source, target]
+            elif not linked:
+                if source not in added.setdefault(target, set()):
+                    added[target].add(source)
+                    out_degree[source] += 1
+        if dropped or added:
+            counts = np.diff(indptr)
+            if dropped:
+                dropped = list(dropped.values())
+                np.subtract.at(counts, np.searchsorted(indptr, dropped, side="right") - 1, 1)
+                indices = np.delete(indices, dropped)
+                indptr = np.concatenate([[0], np.cumsum(counts)])
+            if added:
+                targets = np.array(sorted(added))
+                sources = [sorted(added[target]) for target in targets.tolist()]
+                sizes = np.array([len(row) for row in sources])
+                indices = np.insert(indices, np.repeat(indptr[targets + 1], sizes),
+                                    np.concatenate(sources))
+                counts[targets] += sizes
+            indptr = np.concatenate([[0], np.cumsum(counts)])
+
+        gone = [self.position[page] for page in remove_pages if page in self.position]
+        if gone:
+            kept = np.ones(len(pages), dtype=bool)
+            kept[gone] = False
+            # Pages that linked to a removed page lose that link
+            targets = np.repeat(np.arange(len(pages)), np.diff(indptr))
+            linked = kept[indices] & kept[targets]
+            np.subtract.at(out_degree, indices[~kept[targets]], 1)
+            renumber = np.cumsum(kept) - 1
+            counts = np.bincount(renumber[targets[linked]], minlength=int(kept.sum()))
+            indices = renumber[indices[linked]]
+            indptr = np.concatenate([[0], np.cumsum(counts)])
+            out_degree = out_degree[kept]
+            ranks = ranks[kept]
+            pages = [page for page, keep in zip(pages, kept.tolist()) if keep]
+            self.position = {page: i for i, page in enumerate(pages)}
+
+        self.matrix = LinkMatrix(pages, indptr, indices, out_degree)
+        self.vector, self.iterations = power_iteration(
+            self.matrix, self.damping_factor, self.tolerance, ranks=ranks / ranks.sum()
+        )
+        return self.iterations
+
+    def _links(self, links):
+        position = self.position
+        for source, target in links:
+            if source in position and target in position and source != target:
+                yield position[source], position[target]
@@ -1,24 +1,128 @@
+import argparse
 import os
 import random
 import re
-import sys
+import warnings
 
 DAMPING = 0.85
 SAMPLES = 1000000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    parser = argparse.ArgumentParser(usage="python pagerank.py corpus [options]")
+    parser.add_argument("corpus", help="a directory of HTML pages, or an edge-list file")
+    parser.add_argument("--sampler", choices=["dict", "vector", "parallel"], default="dict",
+                        help="sample with transition_model, with batched NumPy draws, "
+                             "or with batched draws over a process pool")
+    parser.add_argument("--walkers", type=int, default=1,
+                        help="chains stepped at once by the vector samplers")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes for the parallel sampler (default: one per core)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed the vector samplers, for repeatable results")
+    parser.add_argument("--crawl-processes", type=int, default=1,
+                        help="parse HTML files in parallel over this many processes")
+    parser.add_argument("--cache", action="store_true",
+                        help="keep parsed links in the corpus directory, re-parsing only changed files")
+    parser.add_argument("--engine", choices=["dict", "sparse"], default=None,
+                        help="iterate over dicts, or over a sparse NumPy matrix "
+                             "(default: dict, or sparse if --scheme is given)")
+    parser.add_argument("--scheme", default=None,
+                        choices=["power", "gauss-seidel", "aitken", "quadratic"],
+                        help="how the sparse engine converges (default: power)")
+    parser.add_argument("--max-iterations", type=int, default=1000,
+                        help="iterations the sparse engine may run before giving up")
+    parser.add_argument("--topics", action="store_true",
+                        help="also rank pages for a surfer who teleports to one page only, per page")
+    parser.add_argument("--names", default=None,
+                        help="side table naming the pages of an edge list, one per line")
+    parser.add_argument("--top", type=int, default=20,
+                        help="pages to show from an edge list")
+    args = parser.parse_args()
+    if args.scheme is not None and args.engine == "dict":
+        parser.error("--scheme only applies to --engine sparse")
+    engine = args.engine or ("dict" if args.scheme is None else "sparse")
+    scheme = args.scheme or "power"
+    if os.path.isfile(args.corpus):
+        rank_edge_list(args.corpus, args.names, scheme, args.top, args.max_iterations)
+        return
+    if args.cache:
+        from crawlcache import cached_crawl
+        corpus = cached_crawl(args.corpus, args.crawl_processes)
+    elif args.crawl_processes == 1:
+        corpus = crawl(args.corpus)
+    else:
+        from crawler import parallel_crawl
+        corpus = parallel_crawl(args.corpus, args.crawl_processes)
+    intervals = None
+    if args.sampler == "parallel":
+        from sampling import parallel_sample_pagerank
+        ranks, intervals = parallel_sample_pagerank(
+            corpus, DAMPING, SAMPLES, args.processes, walkers=args.walkers, seed=args.seed
+        )
+    elif args.sampler == "vector":
+        from sampling import vector_sample_pagerank
+        ranks = vector_sample_pagerank(corpus, DAMPING, SAMPLES, args.walkers, args.seed)
+    else:
+        ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
+        if intervals is None:
+            print(f"  {page}: {ranks[page]:.4f}")
+        else:
+            low, high = intervals[page]
+            print(f"  {page}: {ranks[page]:.4f} (95% CI {low:.4f} to {high:.4f})")
+    if engine == "sparse":
+        from sparse import LinkMatrix
+        matrix = LinkMatrix.from_corpus(corpus)
+        vector, iterations, failure = sparse_solve(matrix, scheme, args.max_iterations)
+        ranks = matrix.to_dict(vector)
+        print(f"PageRank Results from Iteration ({scheme}, {iterations} iterations)")
+        if failure is not None:
+            print(f"  Not converged: {failure}")
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING)
+        print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    if args.topics:
+        from sparse import topic_pagerank
+        topics = topic_pagerank(corpus, DAMPING, {page: [page] for page in corpus})
+        print(f"Personalised PageRank, top pages per topic page")
+        for topic in sorted(topics):
+            ranks = topics[topic]
+            best = sorted(ranks, key=ranks.get, reverse=True)[:3]
+            print(f"  {topic}: " + ", ".join(f"{page} {ranks[page]:.4f}" for page in best))
+
+
+def rank_edge_list(path, names, scheme, top, max_iterations):
+    """
+    Rank the pages of an edge-list graph with the sparse engine and show
+    the `top` highest ranked, without naming every page.
+    """
+    import numpy as np
+    from edgelist import load_matrix
+    matrix = load_matrix(path, names)
+    ranks, iterations, failure = sparse_solve(matrix, scheme, max_iterations)
+    print(f"PageRank Results from Iteration ({scheme}, {iterations} iterations, "
+          f"{len(matrix)} pages, {len(matrix.indices)} links)")
+    if failure is not None:
+        print(f"  Not converged: {failure}")
+    for i in np.argsort(ranks)[::-1][:top].tolist():
+        print(f"  {matrix.pages[i]}: {ranks[i]:.6f}")
+
+
+def sparse_solve(matrix, scheme, max_iterations):
+    """
+    Solve `matrix` with the sparse engine. Returns the rank vector, the
+    iterations run and, if the solver gave up before converging, why.
+    """
+    from sparse import NotConverged, solve
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", NotConverged)
+        ranks, iterations = solve(matrix, DAMPING, scheme, max_iterations=max_iterations)
+    failures = [str(warning.message) for warning in caught if warning.category is NotConverged]
+    return ranks, iterations, failures[0] if failures else None
 
 
 def crawl(directory):
@@ -123,10 +227,10 @@ def sample_pagerank(corpus, damping_factor, n):
     return pageRank
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, threshold=0.001):
     """
     Return PageRank values for each page by iteratively updating
-    PageRank values until convergence.
+    PageRank values until no value changes by more than `threshold`.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
@@ -144,10 +248,11 @@ def iterate_pagerank(corpus, damping_factor):
     # Useful stuff for later
     N = len(corpus)
     equalProb = (1 - damping_factor) / N
-    maxDiff = 1 / len(corpus)
+    # Always run at least once, however small 1 / N is
+    maxDiff = float("inf")
 
     # Run until the values converge
-    while maxDiff > 0.001:
+    while maxDiff > threshold:
         # For each page in probability distribution
         for p in probabilityDist.keys():
             surfProb = 0
@@ -171,9 +276,10 @@ def iterate_pagerank(corpus, damping_factor):
             newDist[key] = newDist[key] / total
 
         # Get the new maximum change
+        maxDiff = 0
         for key in newDist.keys():
             currentDiff = abs(newDist[key] - probabilityDist[key])
-            maxDiff = currentDiff if currentDiff < maxDiff else maxDiff
+            maxDiff = currentDiff if currentDiff > maxDiff else maxDiff
         # New probability distribution becomes the current one
         probabilityDist = newDist.copy()
 
@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+# Steps drawn per batch of random numbers
+BATCH = 1 << 16
+
+
+class Surfer():
+    """
+    Random surfer over a corpus, with every page's outbound links stored
+    once in compressed sparse row form: page p links to
+    `links[indptr[p]:indptr[p + 1]]`.
+
+    A link is followed with probability `damping_factor` and otherwise,
+    or when a page has no links, the surfer jumps to a page chosen
+    uniformly from the whole corpus, as in `transition_model`.
+    """
+
+    def __init__(self, pages, indptr, links):
+        self.pages = pages
+        self.indptr = indptr
+        self.links = links
+        self.degree = np.diff(indptr)
+
+    def __len__(self):
+        return len(self.pages)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        pages = list(corpus)
+        position = {page: i for i, page in enumerate(pages)}
+        indptr = [0]
+        links = []
+        for page in pages:
+            links.extend(position[link] for link in corpus[page] if link in position)
+            indptr.append(len(links))
+        return cls(pages, np.array(indptr, dtype=np.int64), np.array(links, dtype=np.int64))
+
+    def walk(self, damping_factor, n, walkers=1, rng=None):
+        """
+        Returns visit counts per page over `n` samples, taken by `walkers`
+        independent chains that each start at a random page and share
+        the samples between them.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        if walkers == 1:
+            return self._chain(damping_factor, n, rng)
+
+        size = len(self)
+        counts = np.zeros(size, dtype=np.int64)
+        current = rng.integers(0, size, walkers)
+        taken = min(n, walkers)
+        counts += np.bincount(current[:taken], minlength=size)
+        # Hold whole rounds of positions and count them a batch at a time,
+        # as a bincount costs as much as the corpus is large
+        rounds = max(1, BATCH // walkers)
+        visits = np.empty((rounds, walkers), dtype=np.int64)
+        while taken < n:
+            filled = 0
+            while filled < rounds and taken < n:
+                current = self.step(current, damping_factor, rng)
+                visits[filled] = current
+                filled += 1
+                taken += walkers
+            # The last round may hold more samples than were asked for
+            flat = visits[:filled].ravel()
+            if taken > n:
+                flat = flat[:len(flat) - (taken - n)]
+            counts += np.bincount(flat, minlength=size)
+        return counts
+
+    def step(self, current, damping_factor, rng):
+        """
+        Move each surfer in `current`, an array of page positions, once.
+        """
+        count = len(current)
+        degree = self.degree[current]
+        follow = (rng.random(count) < damping_factor) & (degree > 0)
+        moved = rng.integers(0, len(self), count)
+        chosen = (rng.random(count) * degree).astype(np.int64)
+        moved[follow] = self.links[self.indptr[current[follow]] + chosen[follow]]
+        return moved
+
+    def _chain(self, damping_factor, n, rng):
+        # One chain can't be vectorised across walkers, so draw its random
+        # numbers in batches and step through plain lists
+        size = len(self)
+        counts = np.zeros(size, dtype=np.int64)
+        if n == 0:
+            return counts
+        indptr = self.indptr.tolist()
+        links = self.links.tolist()
+        degree = self.degree.tolist()
+        current = int(rng.integers(0, size))
+        counts[current] += 1
+        remaining = n - 1
+        while remaining > 0:
+            batch = min(remaining, BATCH)
+            visits = []
+            coins = (rng.random(batch) < damping_factor).tolist()
+            choices = rng.random(batch).tolist()
+            jumps = rng.integers(0, size, batch).tolist()
+            for follow, choice, jump in zip(coins, choices, jumps):
+                links_here = degree[current]
+                if follow and links_here:
+                    current = links[indptr[current] + int(choice * links_here)]
+                else:
+                    current = jump
+                visits.append(current)
+            counts += np.bincount(visits, minlength=size)
+            remaining -= batch
+        return counts
+
+
+def vector_sample_pagerank(corpus, damping_factor, n, walkers=1, seed=None):
+    """
+    Return PageRank values for each page, as `sample_pagerank` does, by
+    sampling `n` pages with batched NumPy random numbers. With `walkers`
+    above 1, that many chains are stepped at once.
+    """
+    surfer = Surfer.from_corpus(corpus)
+    counts = surfer.walk(damping_factor, n, walkers, np.random.default_rng(seed))
+    return {page: count / n for page, count in zip(surfer.pages, counts.tolist())}
+
+
+# The surfer a worker process samples with, set by _init_worker
+_surfer = None
+
+
+def _init_worker(surfer):
+    global _surfer
+    _surfer = surfer
+
+
+def _run_chain(task):
+    damping_factor, n, walkers, seed = task
+    return _surfer.walk(damping_factor, n, walkers, np.random.default_rng(seed))
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, processes=None, chains=32,
+                             walkers=1, seed=None, confidence=0.95):
+    """
+    Return PageRank estimates and confidence intervals for each page, by
+    splitting `n` samples between `chains` independent runs of the
+    vectorised sampler, spread over a pool of `processes`.
+
+    Every run gets its own random stream spawned from `seed`, so for a
+    given seed and number of chains the result does not depend on the
+    number of processes. The intervals are the mean of the per-chain
+    estimates plus or minus a normal quantile times their standard
+    error, which, unlike counting samples, allows for each chain's
+    samples being correlated.
+
+    Returns a dict of page -> rank and a dict of page -> (low, high).
+    """
+    if n < 2:
+        raise ValueError("at least two samples are needed, one for each of two chains")
+    surfer = Surfer.from_corpus(corpus)
+    # Intervals need at least two chains, and every chain a sample
+    chains = max(2, min(chains, n))
+    sizes = [n // chains + (i < n % chains) for i in range(chains)]
+    seeds = np.random.SeedSequence(seed).spawn(chains)
+    tasks = [(damping_factor, size, walkers, chain_seed) for size, chain_seed in zip(sizes, seeds)]
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        _init_worker(surfer)
+        counts = list(map(_run_chain, tasks))
+    else:
+        # Fork shares the surfer's arrays with the workers for free
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ctx.Pool(processes, initializer=_init_worker, initargs=(surfer,)) as pool:
+            counts = pool.map(_run_chain, tasks)
+
+    counts = np.array(counts)
+    estimates = counts / np.array(sizes)[:, None]
+    ranks = counts.sum(axis=0) / n
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    margin = z * estimates.std(axis=0, ddof=1) / np.sqrt(chains)
+    low = np.clip(ranks - margin, 0, 1).tolist()
+    high = np.clip(ranks + margin, 0, 1).tolist()
+    pages = surfer.pages
+    return (
+        {page: rank for page, rank in zip(pages, ranks.tolist())},
+        {page: interval for page, interval in zip(pages, zip(low, high))}
+    )
@@ -0,0 +1,408 @@
+import warnings
+
+import numpy as np
+
+# Rows with up to this many inbound links are grouped by exact count;
+# longer rows are padded up to the next of a series of widths growing by
+# WIDTH_GROWTH, so a heavy-tailed graph still gives few groups
+EXACT_WIDTH = 16
+WIDTH_GROWTH = 1.25
+
+# Links summed at a time for one rank vector, bounding temporary memory
+CHUNK_LINKS = 1 << 20
+
+
+class NotConverged(RuntimeWarning):
+    """
+    Warned when a solver stops at its iteration limit with the ranks
+    still changing by more than the tolerance.
+    """
+
+
+class LinkMatrix():
+    """
+    Link structure of a corpus in compressed sparse row form, transposed
+    so that row p holds the pages linking to p: their positions are
+    `indices[indptr[p]:indptr[p + 1]]`.
+
+    `pages` maps positions back to page names, `out_degree[q]` is the
+    number of links on page q and `dangling` marks pages with none.
+    """
+
+    def __init__(self, pages, indptr, indices, out_degree):
+        self.pages = pages
+        self.indptr = indptr
+        self.indices = indices
+        self.out_degree = out_degree
+        self.dangling = out_degree == 0
+        # Row starts of pages with at least one inbound link, for reduceat
+        starts = indptr[:-1]
+        self.starts = starts[starts < indptr[1:]]
+        self.linked = np.flatnonzero(starts < indptr[1:])
+        self._blocks = None
+
+    def __len__(self):
+        return len(self.pages)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build the matrix for `corpus`, a dict of page -> set of linked
+        pages as returned by `crawl`. Links to pages outside the corpus
+        are ignored.
+        """
+        pages = list(corpus)
+        position = {page: i for i, page in enumerate(pages)}
+        sources, targets = [], []
+        for i, page in enumerate(pages):
+            for link in corpus[page]:
+                j = position.get(link)
+                if j is not None:
+                    sources.append(i)
+                    targets.append(j)
+        return cls.from_edges(pages, np.array(sources, dtype=np.int64),
+                              np.array(targets, dtype=np.int64))
+
+    @classmethod
+    def from_edges(cls, pages, sources, targets):
+        """
+        Build the matrix from parallel arrays of link sources and targets,
+        given as positions into `pages`.
+
+        Links are bucketed by target a chunk at a time, so building takes
+        little memory beyond the matrix itself even when the arrays are
+        mapped from a file far larger than memory.
+        """
+        n = len(pages)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        out_degree = np.zeros(n, dtype=np.int64)
+        for start in range(0, len(targets), CHUNK_LINKS):
+            indptr[1:] += np.bincount(targets[start:start + CHUNK_LINKS], minlength=n)
+            out_degree += np.bincount(sources[start:start + CHUNK_LINKS], minlength=n)
+        np.cumsum(indptr, out=indptr)
+
+        dtype = np.int32 if n < 2 ** 31 else np.int64
+        indices = np.empty(len(targets), dtype=dtype)
+        filled = indptr[:-1].copy()
+        bits = CHUNK_LINKS.bit_length()
+        for start in range(0, len(targets), CHUNK_LINKS):
+            # Sort targets with their positions packed into the low bits,
+            # which keeps links to one page in order and beats a stable
+            # argsort
+            chunk = targets[start:start + CHUNK_LINKS]
+            keys = (chunk.astype(np.int64) << bits) | np.arange(len(chunk))
+            keys.sort()
+            order, chunk = keys & (1 << bits) - 1, keys >> bits
+            # Each link goes after those to the same page already placed
+            runs = np.flatnonzero(np.r_[True, chunk[1:] != chunk[:-1]])
+            lengths = np.diff(np.r_[runs, len(chunk)])
+            offsets = np.arange(len(chunk)) - np.repeat(runs, lengths)
+            indices[filled[chunk] + offsets] = sources[start:start + CHUNK_LINKS][order]
+            filled[chunk[runs]] += lengths
+        return cls(pages, indptr, indices, out_degree)
+
+    def spread(self, ranks):
+        """
+        Returns, for each page, the sum over pages q linking to it of
+        `ranks[q] / out_degree[q]`. `ranks` may be a vector or have one
+        column per rank vector.
+        """
+        # One extra zero share at the end, which padding points to
+        shares = np.zeros((len(self) + 1,) + ranks.shape[1:])
+        linking = np.flatnonzero(~self.dangling)
+        shares[linking] = (ranks[linking].T / self.out_degree[linking]).T
+        result = np.zeros_like(ranks)
+        if ranks.ndim == 1:
+            # One vector is summed as fast straight from the CSR rows, a
+            # run of rows at a time
+            starts, linked = self.starts, self.linked
+            cuts = np.searchsorted(starts, np.arange(0, len(self.indices), CHUNK_LINKS))
+            cuts = np.r_[cuts, len(starts)]
+            for first, last in zip(cuts[:-1].tolist(), cuts[1:].tolist()):
+                if first == last:
+                    continue
+                end = starts[last] if last < len(starts) else len(self.indices)
+                gathered = shares[self.indices[starts[first]:end]]
+                result[linked[first:last]] = np.add.reduceat(gathered, starts[first:last] - starts[first])
+            return result
+        for rows, sources in self.blocks():
+            # Adding one column of sources at a time keeps each gather a
+            # (rows, k) array, where gathering the whole block at once
+            # builds a (rows, width, k) one and takes 40% longer
+            total = shares[sources[:, 0]]
+            for slot in range(1, sources.shape[1]):
+                total += shares[sources[:, slot]]
+            result[rows] = total
+        return result
+
+    def blocks(self):
+        """
+        Returns the rows grouped by inbound link count, as a list of
+        (rows, sources) pairs where `sources` is a 2D array holding the
+        pages linking to each row, padded with len(self).
+
+        With many rank vectors at once, summing a block a column of
+        sources at a time takes about a third of the time per vector that
+        summing ragged CSR rows for one vector does. Built on first use.
+        """
+        if self._blocks is None:
+            n = len(self)
+            degree = np.diff(self.indptr)
+            steps = np.ceil(np.log(np.maximum(degree, 1) / EXACT_WIDTH) / np.log(WIDTH_GROWTH))
+            padded = np.ceil(EXACT_WIDTH * WIDTH_GROWTH ** steps).astype(np.int64)
+            widths = np.where(degree <= EXACT_WIDTH, degree, padded)
+            dtype = np.int32 if n < 2 ** 31 - 1 else np.int64
+            self._blocks = []
+            for width in np.unique(widths[degree > 0]).tolist():
+                rows = np.flatnonzero((widths == width) & (degree > 0))
+                slots = np.arange(width)
+                offsets = np.minimum(self.indptr[rows][:, None] + slots, len(self.indices) - 1)
+                sources = np.where(slots < degree[rows][:, None], self.indices[offsets], n)
+                self._blocks.append((rows, sources.astype(dtype)))
+        return self._blocks
+
+    def to_dict(self, ranks):
+        return {page: float(rank) for page, rank in zip(self.pages, ranks)}
+
+
+def power_iteration(matrix, damping_factor, tolerance=1e-10, max_iterations=1000, ranks=None,
+                    norm="l1", extrapolation=None, every=10):
+    """
+    Iterate the PageRank equation over `matrix` from `ranks` (uniform if
+    None) until the change between iterations, measured in the `norm`
+    "l1" or "inf", is at most `tolerance`.
+
+    A dangling page links to every page, which is applied as a rank-one
+    correction rather than stored. With `extrapolation` "aitken" or
+    "quadratic", the iterate is extrapolated from the last few every
+    `every` iterations. Returns the rank vector and the number of
+    iterations run; NotConverged is warned if `max_iterations` ran out
+    first.
+    """
+    n = len(matrix)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    history = []
+    iterations = 0
+    change = np.inf
+    while iterations < max_iterations:
+        new = _step(matrix, damping_factor, ranks)
+        iterations += 1
+        change = _change(new, ranks, norm)
+        ranks = new
+        if change <= tolerance:
+            break
+        if extrapolation is not None:
+            history = history[-3:] + [ranks]
+            if iterations % every == 0 and len(history) == 4 and iterations < max_iterations:
+                # Keep the extrapolated vector only if it is nearer a fixed
+                # point, judged by the change one more step makes to it
+                guess = EXTRAPOLATIONS[extrapolation](history)
+                stepped = _step(matrix, damping_factor, guess)
+                iterations += 1
+                if _change(stepped, guess, norm) < change:
+                    ranks = stepped
+                history = []
+    _check_converged("power iteration", iterations, change, tolerance)
+    return ranks, iterations
+
+
+def gauss_seidel(matrix, damping_factor, tolerance=1e-10, max_iterations=1000, ranks=None,
+                 norm="l1"):
+    """
+    Solve as `power_iteration` does, but sweep through the pages updating
+    ranks in place, so each page's new rank is computed from the newest
+    ranks of the pages linking to it.
+
+    Returns the rank vector and the number of sweeps run; NotConverged
+    is warned if `max_iterations` ran out first.
+    """
+    n = len(matrix)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    indptr = matrix.indptr.tolist()
+    indices = matrix.indices.tolist()
+    degree = matrix.out_degree.tolist()
+    dangling = matrix.dangling.tolist()
+    teleport = (1 - damping_factor) / n
+    iterations = 0
+    change = np.inf
+    while iterations < max_iterations:
+        old = ranks
+        current = ranks.tolist()
+        shares = [rank / links if links else 0.0 for rank, links in zip(current, degree)]
+        lost = sum(rank for rank, empty in zip(current, dangling) if empty)
+        for p in range(n):
+            rank = teleport + damping_factor * (
+                sum(shares[q] for q in indices[indptr[p]:indptr[p + 1]]) + lost / n
+            )
+            # Later pages see this page's new rank straight away
+            if dangling[p]:
+                lost += rank - current[p]
+            else:
+                shares[p] = rank / degree[p]
+            current[p] = rank
+        ranks = np.array(current)
+        ranks /= ranks.sum()
+        iterations += 1
+        change = _change(ranks, old, norm)
+        if change <= tolerance:
+            break
+    _check_converged("Gauss-Seidel", iterations, change, tolerance)
+    return ranks, iterations
+
+
+def _step(matrix, damping_factor, ranks):
+    n = len(matrix)
+    dangling = ranks[matrix.dangling].sum()
+    new = damping_factor * (matrix.spread(ranks) + dangling / n)
+    new += (1 - damping_factor) / n
+    return new / new.sum()
+
+
+def residual(matrix, damping_factor, ranks):
+    """
+    Returns how far `ranks` is from a fixed point: the L1 change one more
+    power iteration step makes to it.
+    """
+    return float(np.abs(_step(matrix, damping_factor, ranks) - ranks).sum())
+
+
+def _check_converged(solver, iterations, change, tolerance):
+    if change > tolerance:
+        warnings.warn(f"{solver} stopped after {iterations} iterations, still changing by "
+                      f"{change:.2e} against a tolerance of {tolerance:.0e}",
+                      NotConverged, stacklevel=3)
+
+
+def _change(new, old, norm):
+    difference = np.abs(new - old)
+    return difference.max() if norm == "inf" else difference.sum()
+
+
+def aitken(history):
+    """
+    Aitken's delta-squared extrapolation of each page's rank from its
+    last three iterates.
+    """
+    x0, x1, x2 = history[-3:]
+    second = x2 - 2 * x1 + x0
+    # Leave pages whose ranks aren't changing geometrically as they are
+    safe = np.abs(second) > 1e-15
+    result = x2.copy()
+    result[safe] = x2[safe] - (x2[safe] - x1[safe]) ** 2 / second[safe]
+    return _normalised(result, x2)
+
+
+def quadratic(history):
+    """
+    Quadratic extrapolation (Kamvar et al.) from the last four iterates,
+    which removes the components along the next two eigenvectors.
+    """
+    x0, x1, x2, x3 = history
+    y = np.column_stack([x1 - x0, x2 - x0])
+    gamma, *_ = np.linalg.lstsq(y, -(x3 - x0), rcond=None)
+    g1, g2, g3 = gamma[0], gamma[1], 1.0
+    result = (g1 + g2 + g3) * x1 + (g2 + g3) * x2 + g3 * x3
+    return _normalised(result, x3)
+
+
+def _normalised(result, fallback):
+    # An extrapolation that leaves the simplex is thrown away
+    if not np.all(np.isfinite(result)) or result.min() < 0 or result.sum() <= 0:
+        return fallback
+    return result / result.sum()
+
+
+EXTRAPOLATIONS = {"aitken": aitken, "quadratic": quadratic}
+
+SCHEMES = ("power", "gauss-seidel", "aitken", "quadratic")
+
+
+def solve(matrix, damping_factor, scheme="power", tolerance=1e-10, norm="l1", ranks=None,
+          max_iterations=1000):
+    """
+    Compute PageRank over `matrix` with the named convergence `scheme`,
+    one of SCHEMES. Returns the rank vector and the number of iterations
+    (or sweeps) run; NotConverged is warned if `max_iterations` ran out
+    first.
+    """
+    if scheme == "gauss-seidel":
+        return gauss_seidel(matrix, damping_factor, tolerance, max_iterations, ranks, norm)
+    extrapolation = None if scheme == "power" else scheme
+    return power_iteration(matrix, damping_factor, tolerance, max_iterations, ranks, norm,
+                           extrapolation)
+
+
+def personalized_pagerank(matrix, damping_factor, teleports, tolerance=1e-10, max_iterations=1000):
+    """
+    Compute one personalised PageRank vector per column of `teleports`,
+    an (n, k) array of teleport distributions over the pages of
+    `matrix`, all at once: each iteration is one sparse product with an
+    (n, k) dense matrix rather than k separate products.
+
+    With probability `1 - damping_factor` the surfer jumps by its
+    column's distribution instead of uniformly; dangling pages still
+    link to every page, as in `transition_model`. A column stops being
+    iterated once it changes by no more than `tolerance` in L1, so the
+    rest don't carry it until the slowest converges. Returns the (n, k)
+    array of rank vectors and the number of iterations the slowest
+    column took; NotConverged is warned if `max_iterations` ran out
+    first.
+    """
+    n = len(matrix)
+    teleports = np.asarray(teleports, dtype=float)
+    teleports = teleports / teleports.sum(axis=0)
+    result = teleports.copy()
+    # Columns still iterating, and their ranks and teleport terms
+    active = np.arange(teleports.shape[1])
+    ranks, jumps = teleports, (1 - damping_factor) * teleports
+    iterations = 0
+    change = np.inf
+    while len(active) and iterations < max_iterations:
+        new = matrix.spread(ranks)
+        new += ranks[matrix.dangling].sum(axis=0) / n
+        new *= damping_factor
+        new += jumps
+        new /= new.sum(axis=0)
+        iterations += 1
+        # The old ranks aren't needed again, so their array holds the change
+        np.subtract(new, ranks, out=ranks)
+        changes = np.abs(ranks, out=ranks).sum(axis=0)
+        ranks = new
+        done = changes <= tolerance
+        if done.any():
+            result[:, active[done]] = ranks[:, done]
+            active, ranks, jumps = active[~done], ranks[:, ~done], jumps[:, ~done]
+        change = changes.max()
+    if len(active):
+        result[:, active] = ranks
+        _check_converged("personalised PageRank", iterations, change, tolerance)
+    return result, iterations
+
+
+def topic_pagerank(corpus, damping_factor, topics, tolerance=1e-10):
+    """
+    Return topic-sensitive PageRank values: `topics` maps a label to the
+    pages whose topic it is, and the result maps each label to a dict of
+    page -> rank for a surfer who teleports only to those pages.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    position = {page: i for i, page in enumerate(matrix.pages)}
+    labels = list(topics)
+    teleports = np.zeros((len(matrix), len(labels)))
+    for column, label in enumerate(labels):
+        for page in topics[label]:
+            teleports[position[page], column] = 1
+    ranks, _ = personalized_pagerank(matrix, damping_factor, teleports, tolerance)
+    return {label: matrix.to_dict(ranks[:, column]) for column, label in enumerate(labels)}
+
+
+def sparse_pagerank(corpus, damping_factor, tolerance=1e-10, scheme="power"):
+    """
+    Return PageRank values for each page, as `iterate_pagerank` does, by
+    iterating over a sparse link matrix built once from `corpus`.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    ranks, _ = solve(matrix, damping_factor, scheme, tolerance)
+    return matrix.to_dict(ranks)
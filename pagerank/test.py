@@ -1,5 +1,8 @@
 import random
 from pagerank import transition_model, sample_pagerank, iterate_pagerank
+from incremental import IncrementalPageRank
+from sampling import parallel_sample_pagerank
+from sparse import sparse_pagerank
 
 DAMPING = 0.85
 SAMPLES = 1000000
@@ -14,6 +17,21 @@ damping_factor = 0.85
 print(sample_pagerank(corpus, damping_factor, SAMPLES))
 print(iterate_pagerank(corpus, damping_factor))
 
-
-
-
+# Same seed, same estimates, however many processes share the chains
+ranks, intervals = parallel_sample_pagerank(corpus, damping_factor, SAMPLES, processes=1, seed=0)
+print(ranks, intervals)
+print(parallel_sample_pagerank(corpus, damping_factor, SAMPLES, processes=2, seed=0)[0] == ranks)
+
+# Incremental updates should agree with ranking the changed corpus afresh
+ranked = IncrementalPageRank(corpus, damping_factor)
+ranked.update(add_links=[("3.html", "4.html"), ("4.html", "1.html")], remove_links=[("1.html", "3.html")])
+changed = {"1.html": {"2.html"}, "2.html": {"3.html"}, "3.html": {"2.html", "4.html"}, "4.html": {"1.html"}}
+incremental, full = ranked.ranks(), sparse_pagerank(changed, damping_factor)
+assert incremental.keys() == full.keys()
+assert max(abs(incremental[page] - full[page]) for page in full) < 1e-8
+
+ranked.update(add_links=[("2.html", "5.html")], remove_pages=["4.html"])
+changed = {"1.html": {"2.html"}, "2.html": {"3.html", "5.html"}, "3.html": {"2.html"}, "5.html": set()}
+incremental, full = ranked.ranks(), sparse_pagerank(changed, damping_factor)
+assert incremental.keys() == full.keys()
+assert max(abs(incremental[page] - full[page]) for page in full) < 1e-8
@@ -0,0 +1,291 @@
+"""
+Benchmarks for the Tic Tac Toe AI.
+
+Usage:
+    python benchmark.py bitboard [--repeats N]
+    python benchmark.py book [--repeats N]
+    python benchmark.py mnk [--boards R,C,K ...] [--time-limit SECONDS]
+    python benchmark.py moves [--opening SQUARE ...]
+    python benchmark.py parallel [--board R,C,K] [--depth N] [--processes N] [--time-limit SECONDS]
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import math
+import os
+import time
+
+import bitboard
+import book
+import mnk
+import tictactoe as ttt
+from parallel import ParallelSearch
+
+
+def timed(function, *args):
+    """
+    Returns the result of calling `function` and the seconds it took.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_bitboard(repeats):
+    """
+    Time the first move from the empty board: the list-of-lists search,
+    the bitboard search with an empty transposition table, and the
+    bitboard search once the table holds every position.
+    """
+    board = ttt.initial_state()
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy, legacy_time = timed(ttt.legacy_minimax, board)
+    bitboard.table.clear()
+    square, cold_time = timed(bitboard.best_move, 0, 0)
+    cold = divmod(square, 3)
+    positions = len(bitboard.table)
+    warm_time = min(timed(bitboard.best_move, 0, 0)[1] for _ in range(repeats))
+
+    print(f"{'search':<16}{'move':>8}{'time':>14}")
+    print(f"{'legacy':<16}{str(legacy):>8}{legacy_time * 1e6:>11.0f} us")
+    print(f"{'bitboard cold':<16}{str(cold):>8}{cold_time * 1e6:>11.0f} us")
+    print(f"{'bitboard warm':<16}{str(cold):>8}{warm_time * 1e6:>11.1f} us")
+    print(f"{positions} canonical positions in the transposition table")
+
+
+def bench_book(repeats):
+    """
+    Time a move from every reachable position, looked up in the opening
+    book against searched for with a warm transposition table.
+    """
+    opening = book.load_book()
+    if opening is None:
+        book.generate()
+        opening = book.load_book()
+    positions = book.positions()
+    bitboard.table.clear()
+    for x, o in positions:
+        bitboard.best_move(x, o)
+
+    lookup = min(timed(lambda: [opening.lookup(x, o) for x, o in positions])[1] for _ in range(repeats))
+    search = min(timed(lambda: [bitboard.best_move(x, o) for x, o in positions])[1] for _ in range(repeats))
+    print(f"{len(opening)} book entries, {len(positions)} positions timed")
+    print(f"{'method':<16}{'per move':>14}")
+    print(f"{'book lookup':<16}{lookup / len(positions) * 1e6:>11.2f} us")
+    print(f"{'warm search':<16}{search / len(positions) * 1e6:>11.2f} us")
+
+
+def bench_mnk(boards, time_limit):
+    """
+    Play the engine against itself on each board, reporting how long
+    moves took, how deep the searches got and the nodes searched per
+    second.
+    """
+    print(f"{'board':<8}{'moves':>6}{'mean (s)':>10}{'max (s)':>9}{'min depth':>11}"
+          f"{'max depth':>11}{'nodes/s':>10}{'winner':>8}")
+    for rows, columns, k in boards:
+        game = mnk.Game(rows, columns, k)
+        search = mnk.Search(game, time_limit)
+        x = o = 0
+        times, depths, nodes = [], [], 0
+        while True:
+            square, elapsed = timed(search.best_move, x, o)
+            if square is None:
+                break
+            times.append(elapsed)
+            depths.append(search.depth)
+            nodes += search.nodes
+            if x.bit_count() == o.bit_count():
+                x |= 1 << square
+            else:
+                o |= 1 << square
+        winner = "X" if game.won(x) else "O" if game.won(o) else "-"
+        print(f"{f'{rows}x{columns},{k}':<8}{len(times):>6}{sum(times) / len(times):>10.3f}"
+              f"{max(times):>9.3f}{min(depths):>11}{max(depths):>11}"
+              f"{nodes / sum(times):>10.0f}{winner:>8}")
+
+
+def copied_result(board, action):
+    """
+    Returns the board after `action`, as the original `result` made it:
+    deep-copied, with the move checked against every empty square.
+    """
+    new_board = copy.deepcopy(board)
+    if action not in ttt.actions(board):
+        raise Exception("Invalid action")
+    new_board[action[0]][action[1]] = ttt.player(board)
+    return new_board
+
+
+def scanned_winner(board):
+    """
+    Returns the winner of a 3x3 board, as the original `winner` found it:
+    by checking each row, column and diagonal in turn.
+    """
+    for row in board:
+        if row[0] == row[1] == row[2] and row[0] is not ttt.EMPTY:
+            return row[0]
+    for i in range(3):
+        if board[0][i] == board[1][i] == board[2][i] and board[0][i] is not ttt.EMPTY:
+            return board[0][i]
+    if board[0][0] == board[1][1] == board[2][2] and board[0][0] is not ttt.EMPTY:
+        return board[0][0]
+    if board[0][2] == board[1][1] == board[2][0] and board[0][2] is not ttt.EMPTY:
+        return board[0][2]
+    return ttt.EMPTY
+
+
+def copied_minimax(board, counter):
+    """
+    Returns the minimax value of a list-of-lists board, found with the
+    original deep-copying `result` and scanning `winner`, counting
+    positions in `counter`.
+    """
+    counter[0] += 1
+    winner = scanned_winner(board)
+    if winner is not ttt.EMPTY:
+        return 1 if winner == ttt.X else -1
+    if all(cell is not ttt.EMPTY for row in board for cell in row):
+        return 0
+    values = [copied_minimax(copied_result(board, action), counter) for action in ttt.actions(board)]
+    return max(values) if ttt.player(board) == ttt.X else min(values)
+
+
+def board_minimax(board, counter):
+    """
+    Returns the minimax value of a list-of-lists board, found with the
+    current `result`, `terminal` and `utility`, counting positions in
+    `counter`.
+    """
+    counter[0] += 1
+    if ttt.terminal(board):
+        return ttt.utility(board)
+    values = [board_minimax(ttt.result(board, action), counter) for action in ttt.actions(board)]
+    return max(values) if ttt.player(board) == ttt.X else min(values)
+
+
+def position_minimax(position, counter):
+    """
+    Returns the minimax value of a Position, found by making and
+    unmaking moves on it, counting positions in `counter`.
+    """
+    counter[0] += 1
+    if position.terminal():
+        return position.utility()
+    values = []
+    occupied = position.masks[0] | position.masks[1]
+    for square in range(position.game.size):
+        if not occupied >> square & 1:
+            position.make(square)
+            values.append(position_minimax(position, counter))
+            position.unmake()
+    return min(values) if position.turn else max(values)
+
+
+def bench_moves(opening):
+    """
+    Time a full minimax search of 3x3 after the `opening` squares have
+    been played: on list-of-lists boards with the original deep-copying
+    rules, on list-of-lists boards with the current rules, and on one
+    Position that moves are made and unmade on.
+    """
+    board = ttt.initial_state()
+    position = mnk.Position(mnk.game())
+    for square in opening:
+        board = ttt.result(board, divmod(square, 3))
+        position.make(square)
+
+    print(f"{'boards':<10}{'value':>6}{'positions':>11}{'time (s)':>10}{'positions/s':>13}")
+    rates = []
+    searches = (("deepcopy", copied_minimax, board), ("lists", board_minimax, board),
+                ("position", position_minimax, position))
+    for label, search, start in searches:
+        counter = [0]
+        value, elapsed = timed(search, start, counter)
+        rates.append(counter[0] / elapsed)
+        print(f"{label:<10}{value:>6}{counter[0]:>11}{elapsed:>10.2f}{rates[-1]:>13.0f}")
+    print(f"position: {rates[2] / rates[0]:.1f}x the positions per second of deepcopy, "
+          f"{rates[2] / rates[1]:.1f}x of lists")
+
+
+def bench_parallel(board, depth, processes, time_limit):
+    """
+    Search from the empty board serially and split at the root over 1,
+    2, 4... worker processes up to `processes`: first `depth` plies deep,
+    reporting the speedup over the serial search, then for `time_limit`
+    seconds, reporting how deep each got and the nodes it searched.
+    """
+    rows, columns, k = board
+    game = mnk.Game(rows, columns, k)
+    counts, count = [], 1
+    while True:
+        counts.append(count)
+        if count >= processes:
+            break
+        count = min(count * 2, processes)
+
+    print(f"{rows}x{columns},{k} to depth {depth}, {os.cpu_count()} cores")
+    print(f"{'search':<14}{'move':>6}{'score':>8}{'nodes':>10}{'time (s)':>10}{'speedup':>9}")
+    search = mnk.Search(game, math.inf)
+    square, base = timed(search.best_move, 0, 0, None, depth)
+    print(f"{'serial':<14}{square:>6}{search.score:>8}{search.nodes:>10}{base:>10.2f}{1:>9.2f}")
+    for count in counts:
+        with ParallelSearch(game, math.inf, count) as search:
+            square, elapsed = timed(search.best_move, 0, 0, None, depth)
+        print(f"{f'root x{count}':<14}{square:>6}{search.score:>8}{search.nodes:>10}"
+              f"{elapsed:>10.2f}{base / elapsed:>9.2f}")
+
+    print(f"{rows}x{columns},{k} for {time_limit} s")
+    print(f"{'search':<14}{'move':>6}{'depth':>7}{'nodes':>10}{'nodes/s':>10}")
+    searches = [("serial", mnk.Search(game, time_limit))]
+    searches += [(f"root x{count}", ParallelSearch(game, time_limit, count)) for count in counts]
+    for label, search in searches:
+        square, elapsed = timed(search.best_move, 0, 0)
+        if isinstance(search, ParallelSearch):
+            search.close()
+        print(f"{label:<14}{square:>6}{search.depth:>7}{search.nodes:>10}{search.nodes / elapsed:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("bitboard", help="first move from the empty board, legacy against bitboard")
+    command.add_argument("--repeats", type=int, default=1000)
+
+    command = commands.add_parser("book", help="opening book lookups against warm search")
+    command.add_argument("--repeats", type=int, default=20)
+
+    command = commands.add_parser("mnk", help="per-move latency of the m,n,k engine in self-play")
+    command.add_argument("--boards", nargs="+", default=[(3, 3, 3), (4, 4, 4), (5, 5, 4)],
+                         type=lambda board: tuple(int(n) for n in board.split(",")))
+    command.add_argument("--time-limit", type=float, default=ttt.TIME_LIMIT)
+
+    command = commands.add_parser("moves", help="positions searched per second, list boards against make/unmake")
+    command.add_argument("--opening", type=int, nargs="*", default=[4, 0],
+                         help="squares, 0 to 8, played before searching")
+
+    command = commands.add_parser("parallel", help="root-parallel search speedup against processes")
+    command.add_argument("--board", default=(4, 4, 4),
+                         type=lambda board: tuple(int(n) for n in board.split(",")))
+    command.add_argument("--depth", type=int, default=8)
+    command.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    command.add_argument("--time-limit", type=float, default=2.0)
+
+    args = parser.parse_args()
+    if args.command == "bitboard":
+        bench_bitboard(args.repeats)
+    elif args.command == "book":
+        bench_book(args.repeats)
+    elif args.command == "mnk":
+        bench_mnk(args.boards, args.time_limit)
+    elif args.command == "moves":
+        bench_moves(args.opening)
+    elif args.command == "parallel":
+        bench_parallel(args.board, args.depth, args.processes, args.time_limit)
+
+
+if __name__ == "__main__":
+    main()
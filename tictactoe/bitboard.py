@@ -0,0 +1,145 @@
+"""
+Tic Tac Toe search over bitboards.
+
+A position is two 9-bit masks, one for X's squares and one for O's, with
+square (i, j) at bit 3 * i + j. Values are memoised in a transposition
+table keyed by the smallest of the position's eight rotations and
+reflections, so each position is searched once however it was reached.
+"""
+
+# Rows, columns and diagonals
+WINS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+FULL = 0b111111111
+
+
+def _symmetries():
+    """
+    Returns the eight symmetries of the board as tuples mapping each
+    square to where it goes.
+    """
+    rotate = [3 * j + (2 - i) for i in range(3) for j in range(3)]
+    reflect = [3 * i + (2 - j) for i in range(3) for j in range(3)]
+    maps = []
+    current = list(range(9))
+    for _ in range(4):
+        maps.append(tuple(current))
+        maps.append(tuple(reflect[square] for square in current))
+        current = [rotate[square] for square in current]
+    return maps
+
+
+SYMMETRIES = _symmetries()
+
+# SYMMETRY_TABLES[s][mask] is `mask` with every square moved by symmetry s
+SYMMETRY_TABLES = tuple(
+    tuple(sum(1 << moved[square] for square in range(9) if mask >> square & 1) for mask in range(1 << 9))
+    for moved in SYMMETRIES
+)
+
+# INVERSES[s][square] is the square symmetry s moves to `square`
+INVERSES = tuple(
+    tuple(moved.index(square) for square in range(9))
+    for moved in SYMMETRIES
+)
+
+# The value of each position solved so far, by canonical key
+table = {}
+
+
+def from_board(board):
+    """
+    Returns the (X mask, O mask) of a list-of-lists board.
+    """
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == "X":
+                x |= 1 << (3 * i + j)
+            elif cell == "O":
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def won(mask):
+    """
+    Returns True if the squares in `mask` complete a line.
+    """
+    for line in WINS:
+        if mask & line == line:
+            return True
+    return False
+
+
+def canonical(x, o):
+    """
+    Returns the key shared by a position and all its symmetric copies.
+    """
+    return min(tables[x] | tables[o] << 9 for tables in SYMMETRY_TABLES)
+
+
+def orient(x, o):
+    """
+    Returns the canonical key of a position and the index of a symmetry
+    that turns the position into the canonical one.
+    """
+    return min((tables[x] | tables[o] << 9, s) for s, tables in enumerate(SYMMETRY_TABLES))
+
+
+def value(x, o):
+    """
+    Returns 1 if X wins with perfect play from the position, -1 if O
+    does, 0 otherwise.
+    """
+    if won(x):
+        return 1
+    if won(o):
+        return -1
+    occupied = x | o
+    if occupied == FULL:
+        return 0
+    key = canonical(x, o)
+    if key in table:
+        return table[key]
+
+    x_to_move = bin(x).count("1") == bin(o).count("1")
+    best = -2 if x_to_move else 2
+    free = FULL & ~occupied
+    while free:
+        move = free & -free
+        free ^= move
+        if x_to_move:
+            best = max(best, value(x | move, o))
+            if best == 1:
+                break
+        else:
+            best = min(best, value(x, o | move))
+            if best == -1:
+                break
+    table[key] = best
+    return best
+
+
+def best_move(x, o):
+    """
+    Returns the optimal square for the player to move, as a bit index,
+    or None if the game is over. Ties go to the lowest square.
+    """
+    occupied = x | o
+    if won(x) or won(o) or occupied == FULL:
+        return None
+    x_to_move = bin(x).count("1") == bin(o).count("1")
+    best, choice = None, None
+    for square in range(9):
+        move = 1 << square
+        if occupied & move:
+            continue
+        score = value(x | move, o) if x_to_move else -value(x, o | move)
+        if best is None or score > best:
+            best, choice = score, square
+            if score == 1:
+                break
+    return choice
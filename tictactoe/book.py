@@ -0,0 +1,188 @@
+"""
+A perfect-play opening book for Tic Tac Toe.
+
+Usage:
+    python book.py generate [BOOK]
+    python book.py verify [BOOK]
+
+Every position reachable from the empty board is solved once, and the
+best move and value of each one are stored under its canonical key, so
+a move can be looked up rather than searched for. Symmetric positions
+share an entry; the stored move is for the canonical orientation and is
+turned back to the asked-about one on lookup.
+
+The file is MAGIC, a little-endian uint32 entry count, the sorted keys
+as uint32s, then one byte per entry: the move's square times four plus
+the value plus one.
+"""
+
+import argparse
+import bisect
+import os
+import struct
+import sys
+from array import array
+
+import bitboard
+
+MAGIC = b"TTTBOOK1"
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.book")
+
+
+def positions():
+    """
+    Returns a list of the (X mask, O mask) of one position for each
+    canonical key reachable from the empty board, where the game is not
+    yet over.
+    """
+    seen = set()
+    found = []
+    stack = [(0, 0)]
+    while stack:
+        x, o = stack.pop()
+        if bitboard.won(x) or bitboard.won(o) or x | o == bitboard.FULL:
+            continue
+        key = bitboard.canonical(x, o)
+        if key in seen:
+            continue
+        seen.add(key)
+        found.append((x, o))
+        x_to_move = bin(x).count("1") == bin(o).count("1")
+        for square in range(9):
+            move = 1 << square
+            if not (x | o) & move:
+                stack.append((x | move, o) if x_to_move else (x, o | move))
+    return found
+
+
+def generate(path=BOOK_PATH):
+    """
+    Solve every reachable position and write the book to `path`. Returns
+    the number of entries.
+    """
+    entries = []
+    for x, o in positions():
+        key, s = bitboard.orient(x, o)
+        tables = bitboard.SYMMETRY_TABLES[s]
+        x, o = tables[x], tables[o]
+        entries.append((key, bitboard.best_move(x, o), bitboard.value(x, o)))
+    entries.sort()
+
+    keys = array("I", [key for key, _, _ in entries])
+    if sys.byteorder != "little":
+        keys.byteswap()
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(entries)))
+        f.write(keys.tobytes())
+        f.write(bytes(move << 2 | value + 1 for _, move, value in entries))
+    os.replace(path + ".tmp", path)
+    return len(entries)
+
+
+def load_book(path=BOOK_PATH):
+    """
+    Read the book at `path`, or return None if there is none or it
+    can't be read.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if data[:len(MAGIC)] != MAGIC or len(data) < len(MAGIC) + 4:
+        return None
+    (count,) = struct.unpack_from("<I", data, len(MAGIC))
+    start = len(MAGIC) + 4
+    if len(data) != start + 5 * count:
+        return None
+    keys = array("I")
+    keys.frombytes(data[start:start + 4 * count])
+    if sys.byteorder != "little":
+        keys.byteswap()
+    return Book(keys, data[start + 4 * count:])
+
+
+class Book():
+    """
+    The best move and value of every reachable position, by canonical key.
+    """
+
+    def __init__(self, keys, entries):
+        self.keys = keys
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, x, o):
+        """
+        Returns the best square to play and the value of a position, or
+        None if the position is not in the book.
+        """
+        key, s = bitboard.orient(x, o)
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        entry = self.entries[i]
+        return bitboard.INVERSES[s][entry >> 2], (entry & 3) - 1
+
+
+def verify(book):
+    """
+    Check the book against a fresh search of every reachable position,
+    each in its own orientation. Returns the number of positions checked
+    and a list of the (X mask, O mask) of those where the book's value
+    is wrong or its move doesn't keep that value.
+    """
+    bitboard.table.clear()
+    wrong = []
+    stack, seen = [(0, 0)], set()
+    while stack:
+        x, o = stack.pop()
+        if (x, o) in seen or bitboard.won(x) or bitboard.won(o) or x | o == bitboard.FULL:
+            continue
+        seen.add((x, o))
+        x_to_move = bin(x).count("1") == bin(o).count("1")
+        expected = bitboard.value(x, o)
+        found = book.lookup(x, o)
+        if found is None:
+            wrong.append((x, o))
+        else:
+            square, value = found
+            move = 1 << square
+            after = (x | move, o) if x_to_move else (x, o | move)
+            if value != expected or (x | o) & move or bitboard.value(*after) != expected:
+                wrong.append((x, o))
+        for square in range(9):
+            move = 1 << square
+            if not (x | o) & move:
+                stack.append((x | move, o) if x_to_move else (x, o | move))
+    return len(seen), wrong
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("generate", help="solve every position and write the book")
+    command.add_argument("book", nargs="?", default=BOOK_PATH)
+    command = commands.add_parser("verify", help="check the book against live search")
+    command.add_argument("book", nargs="?", default=BOOK_PATH)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        count = generate(args.book)
+        print(f"{count} positions written to {args.book} ({os.path.getsize(args.book)} bytes)")
+    elif args.command == "verify":
+        book = load_book(args.book)
+        if book is None:
+            sys.exit(f"No book at {args.book}")
+        checked, wrong = verify(book)
+        for x, o in wrong:
+            print(f"Wrong: X {x:09b} O {o:09b}")
+        print(f"{checked} positions checked against {len(book)} entries, {len(wrong)} wrong")
+        if wrong:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Search for m,n,k-games: Tic Tac Toe on a board of any size, won by k in
+a row.
+
+A position is two bitmasks, one per player, with square (i, j) at bit
+i * columns + j, along with a count of each player's stones on every
+line, packed into one integer so a move updates all its lines with one
+addition and whether it won is known at once. A Position makes and
+takes back moves in place; the search, a negamax alpha-beta deepened
+one ply at a time until a time budget runs out, hands the same masks
+and counts down as integers.
+
+Moves are tried best guess first: the move that was best in this
+position last time, then the killer moves that caused cutoffs at the
+same depth elsewhere, then squares nearest the centre. Positions deeper
+than the search can reach are scored by counting the lines each player
+could still complete.
+"""
+
+import functools
+import math
+import time
+
+# Scores at least this large are wins found by search, not estimates
+WIN = 1 << 40
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Clear the transposition table past this many positions
+TABLE_LIMIT = 1 << 20
+
+
+class Game():
+    """
+    The lines and square order of a `rows` by `columns` board won by `k`
+    in a row.
+    """
+
+    def __init__(self, rows=3, columns=3, k=3):
+        if not 0 < k <= max(rows, columns):
+            raise ValueError(f"can't get {k} in a row on a {rows}x{columns} board")
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.size = rows * columns
+        self.full = (1 << self.size) - 1
+
+        lines = []
+        for i in range(rows):
+            for j in range(columns):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < columns:
+                        lines.append(sum(1 << ((i + di * n) * columns + j + dj * n) for n in range(k)))
+        self.lines = tuple(lines)
+        # through[square] holds the lines a move on `square` could complete
+        self.through = tuple(
+            tuple(line for line in self.lines if line >> square & 1)
+            for square in range(self.size)
+        )
+
+        # Stone counts for every line packed into one integer, `width` bits
+        # a line: playing `square` adds steps[square], and a line holding k
+        # stones sets its top bit once `bias` is added
+        width = k.bit_length() + 1
+        self.steps = tuple(
+            sum(1 << (i * width) for i, line in enumerate(self.lines) if line >> square & 1)
+            for square in range(self.size)
+        )
+        self.bias = sum((1 << (width - 1)) - k << (i * width) for i in range(len(self.lines)))
+        self.top = sum(1 << (i * width + width - 1) for i in range(len(self.lines)))
+        # Squares nearest the centre first
+        centre_i, centre_j = (rows - 1) / 2, (columns - 1) / 2
+        self.order = tuple(sorted(
+            range(self.size),
+            key=lambda square: (abs(square // columns - centre_i) + abs(square % columns - centre_j), square)
+        ))
+        # A line held by one player alone scores WEIGHTS[stones on it]
+        self.weights = tuple(0 if n == 0 else 4 ** n for n in range(k + 1))
+
+    def from_board(self, board):
+        """
+        Returns the (X mask, O mask) of a list-of-lists board.
+        """
+        x = o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == "X":
+                    x |= 1 << (i * self.columns + j)
+                elif cell == "O":
+                    o |= 1 << (i * self.columns + j)
+        return x, o
+
+    def won(self, mask, square=None):
+        """
+        Returns True if the squares in `mask` complete a line; only lines
+        through `square` are checked if it is given.
+        """
+        for line in self.lines if square is None else self.through[square]:
+            if mask & line == line:
+                return True
+        return False
+
+    def to_move(self, x, o):
+        """
+        Returns the masks of the player to move and of the other player.
+        """
+        return (x, o) if x.bit_count() == o.bit_count() else (o, x)
+
+    def evaluate(self, me, them):
+        """
+        Returns an estimate of a position's value to the player to move,
+        from the lines each player could still complete.
+        """
+        weights = self.weights
+        score = 0
+        for line in self.lines:
+            mine, theirs = me & line, them & line
+            if not theirs:
+                score += weights[mine.bit_count()]
+            elif not mine:
+                score -= weights[theirs.bit_count()]
+        return score
+
+
+@functools.lru_cache(maxsize=None)
+def game(rows=3, columns=3, k=3):
+    """
+    Returns the shared Game for a board size and line length.
+    """
+    return Game(rows, columns, k)
+
+
+class Position():
+    """
+    A game in progress, changed in place by making and unmaking moves.
+
+    Each player's stones on every line are counted as moves are made, so
+    making a move tells at once whether it won, and whether the game is
+    over can be asked without looking at the board.
+    """
+
+    def __init__(self, game, x=0, o=0):
+        self.game = game
+        self.steps, self.bias, self.top = game.steps, game.bias, game.top
+        # Indexed by player: 0 for X, 1 for O
+        self.masks = [0, 0]
+        self.counts = [0, 0]
+        self.filled = 0
+        self.winner = None
+        self.history = []
+        for square in range(game.size):
+            if (x | o) >> square & 1:
+                self.turn = 0 if x >> square & 1 else 1
+                self.make(square)
+        self.turn = 0 if x.bit_count() == o.bit_count() else 1
+        self.history.clear()
+
+    def make(self, square):
+        """
+        Play `square` for the player to move.
+        """
+        player = self.turn
+        self.history.append((square, self.winner))
+        self.masks[player] |= 1 << square
+        counts = self.counts[player] + self.steps[square]
+        self.counts[player] = counts
+        if (counts + self.bias) & self.top:
+            self.winner = player
+        self.filled += 1
+        self.turn = player ^ 1
+
+    def unmake(self):
+        """
+        Take back the last move made.
+        """
+        square, self.winner = self.history.pop()
+        player = self.turn ^ 1
+        self.masks[player] ^= 1 << square
+        self.counts[player] -= self.steps[square]
+        self.filled -= 1
+        self.turn = player
+
+    def terminal(self):
+        """
+        Returns True if the game is over.
+        """
+        return self.winner is not None or self.filled == self.game.size
+
+    def utility(self):
+        """
+        Returns 1 if X has won, -1 if O has won, 0 otherwise.
+        """
+        return 0 if self.winner is None else 1 - 2 * self.winner
+
+    def evaluate(self):
+        """
+        Returns Game.evaluate for the player to move.
+        """
+        player = self.turn
+        return self.game.evaluate(self.masks[player], self.masks[player ^ 1])
+
+
+class OutOfTime(Exception):
+    pass
+
+
+class Search():
+    """
+    Iterative-deepening alpha-beta search over one Game, keeping its
+    transposition table from one move to the next.
+    """
+
+    def __init__(self, game, budget=1.0):
+        self.game = game
+        self.budget = budget
+        # (mover's mask, other mask) -> (depth, score, bound, best square)
+        self.table = {}
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+
+    def best_move(self, x, o, budget=None, max_depth=None):
+        """
+        Returns the best square for the player to move found within
+        `budget` seconds (default: the search's own budget) and, if given,
+        `max_depth` plies, or None if the game is over. The depth reached,
+        nodes searched and score of the move are left in `depth`, `nodes`
+        and `score`.
+        """
+        game = self.game
+        position = Position(game, x, o)
+        if position.terminal():
+            return None
+        self._make_room()
+        budget = self.budget if budget is None else budget
+        player = position.turn
+        me, them = position.masks[player], position.masks[player ^ 1]
+        counts = position.counts[player], position.counts[player ^ 1]
+        deepest = game.size - position.filled
+        if max_depth is not None:
+            deepest = min(deepest, max_depth)
+        self.killers = [[None, None] for _ in range(deepest + 1)]
+        self.nodes = 0
+        self.check_at = 1024
+
+        start = time.perf_counter()
+        best = None
+        for depth in range(1, deepest + 1):
+            # The first depth always finishes, so there is always a move
+            self.deadline = math.inf if best is None else start + budget
+            try:
+                score, square = self._root(me, them, *counts, depth, best)
+            except OutOfTime:
+                break
+            best, self.depth, self.score = square, depth, score
+            if abs(score) >= WIN - game.size or time.perf_counter() - start > budget:
+                break
+        return best
+
+    def _make_room(self):
+        """
+        Clear the transposition table if it has grown past TABLE_LIMIT.
+        """
+        if len(self.table) > TABLE_LIMIT:
+            self.table.clear()
+
+    def _root(self, me, them, mine, theirs, depth, previous):
+        """
+        Returns the score and best square of a search `depth` plies deep,
+        trying `previous`, the best square of the last depth, first.
+        """
+        game = self.game
+        alpha, beta = -math.inf, math.inf
+        best_score, best_square = -math.inf, None
+        for square in self._ordered(me | them, previous, 0):
+            counts = mine + game.steps[square]
+            if (counts + game.bias) & game.top:
+                score = WIN - (me | them).bit_count() - 1
+            else:
+                score = -self._search(them, me | 1 << square, theirs, counts, depth - 1, -beta, -alpha, 1)
+            if score > best_score:
+                best_score, best_square = score, square
+                alpha = max(alpha, score)
+        return best_score, best_square
+
+    def _search(self, me, them, mine, theirs, depth, alpha, beta, ply):
+        """
+        Returns the negamax score of a position for the player to move,
+        `me`, exact if it lies between `alpha` and `beta` and a bound on
+        the side it falls outside otherwise. `mine` and `theirs` are the
+        players' packed line counts, as Position keeps them; a search
+        hands them down rather than making and unmaking moves on one
+        Position, which costs several times as much per move.
+        """
+        self.nodes += 1
+        if self.nodes >= self.check_at:
+            self.check_at = self.nodes + 1024
+            if time.perf_counter() > self.deadline:
+                raise OutOfTime()
+        game = self.game
+        occupied = me | them
+        if occupied == game.full:
+            return 0
+        if depth == 0:
+            return game.evaluate(me, them)
+
+        key = (me, them)
+        entry = self.table.get(key)
+        hint = None
+        if entry is not None:
+            stored_depth, score, bound, hint = entry
+            if stored_depth >= depth and (
+                bound == EXACT
+                or bound == LOWER and score >= beta
+                or bound == UPPER and score <= alpha
+            ):
+                return score
+
+        original_alpha = alpha
+        best_score, best_square = -math.inf, None
+        # A win's score falls the more stones it takes, so quicker wins
+        # are preferred and the score doesn't depend on the search's root
+        win = WIN - occupied.bit_count() - 1
+        steps, bias, top = game.steps, game.bias, game.top
+        for square in self._ordered(occupied, hint, ply):
+            counts = mine + steps[square]
+            if (counts + bias) & top:
+                score = win
+            elif depth == 1:
+                # Most of the tree is leaves, so they are scored here rather
+                # than by a call each
+                self.nodes += 1
+                child = me | 1 << square
+                score = 0 if child | them == game.full else -game.evaluate(them, child)
+            else:
+                score = -self._search(them, me | 1 << square, theirs, counts, depth - 1, -beta, -alpha, ply + 1)
+            if score > best_score:
+                best_score, best_square = score, square
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        killers = self.killers[ply]
+                        if killers[0] != square:
+                            killers[0], killers[1] = square, killers[0]
+                        break
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table[key] = (depth, best_score, bound, best_square)
+        return best_score
+
+    def _ordered(self, occupied, hint, ply):
+        """
+        Yields the empty squares, `hint` and the killer moves for `ply`
+        first, then the rest nearest the centre first.
+        """
+        first = [hint] + self.killers[ply]
+        tried = occupied
+        for square in first:
+            if square is not None and not tried >> square & 1:
+                tried |= 1 << square
+                yield square
+        for square in self.game.order:
+            if not tried >> square & 1:
+                yield square
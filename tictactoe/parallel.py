@@ -0,0 +1,201 @@
+"""
+Root-parallel search for m,n,k-games.
+
+Each move from the root is searched in a worker process. The workers
+share two things in memory: the best score any of them has proven for
+the root so far, which narrows the window every later root move is
+searched with, and one transposition table, so a position one worker
+has searched need not be searched again by another.
+"""
+
+import math
+import multiprocessing
+import os
+
+from mnk import WIN, OutOfTime, Search, game
+
+# Slots in the shared transposition table
+TABLE_SLOTS = 1 << 20
+
+# Stands for minus infinity in the shared root bound
+NO_BOUND = -(1 << 62)
+
+# Each player's mask must fit one 64-bit word of the table
+MAX_SQUARES = 64
+
+# Bit fields of a packed table entry: score, depth, bound, best square + 1
+SCORE_BITS, DEPTH_BITS, BOUND_BITS, SQUARE_BITS = 44, 8, 2, 8
+
+
+class SharedTable():
+    """
+    A fixed-size transposition table in shared memory that every worker
+    reads and writes without locking.
+
+    Each slot holds both players' masks and a data word, so an entry is
+    only ever found by its own position, not by another with the same
+    hash. The mask words are stored XORed with the data word, so a slot
+    half written by one process as another reads it fails the key check
+    and reads as empty, rather than pairing one position's masks with
+    another's entry. A new entry always replaces the old one in its slot.
+    """
+
+    def __init__(self, slots=TABLE_SLOTS, arrays=None, context=multiprocessing):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.slots = slots
+        if arrays is None:
+            arrays = tuple(context.RawArray("Q", slots) for _ in range(3))
+        self.mine, self.theirs, self.data = arrays
+
+    def arrays(self):
+        return self.mine, self.theirs, self.data
+
+    def get(self, key):
+        """
+        Returns the (depth, score, bound, best square) stored for `key`,
+        a pair of masks, or None.
+        """
+        me, them = key
+        i = hash(key) & (self.slots - 1)
+        data = self.data[i]
+        if not data or self.mine[i] ^ data != me or self.theirs[i] ^ data != them:
+            return None
+        score = (data & ((1 << SCORE_BITS) - 1)) - (1 << (SCORE_BITS - 1))
+        data >>= SCORE_BITS
+        depth = data & ((1 << DEPTH_BITS) - 1)
+        data >>= DEPTH_BITS
+        bound = data & ((1 << BOUND_BITS) - 1)
+        square = (data >> BOUND_BITS) - 1
+        return depth, score, bound, None if square < 0 else square
+
+    def __setitem__(self, key, entry):
+        depth, score, bound, square = entry
+        data = ((0 if square is None else square + 1) << BOUND_BITS | bound) << DEPTH_BITS | min(depth, 255)
+        data = data << SCORE_BITS | score + (1 << (SCORE_BITS - 1))
+        me, them = key
+        i = hash(key) & (self.slots - 1)
+        self.mine[i] = me ^ data
+        self.theirs[i] = them ^ data
+        self.data[i] = data
+
+    def clear(self):
+        for i in range(self.slots):
+            self.mine[i] = self.theirs[i] = self.data[i] = 0
+
+
+# Each worker's search, and the root bound and its move shared by all
+worker = None
+shared_best = None
+
+
+def _init_worker(rows, columns, k, arrays, best):
+    global worker, shared_best
+    worker = Search(game(rows, columns, k))
+    worker.table = SharedTable(len(arrays[0]), arrays)
+    shared_best = best
+
+
+def _search_move(task):
+    """
+    Search one root move. Returns its square, its score, or None if time
+    ran out first, and the nodes searched.
+    """
+    me, them, mine, theirs, square, depth, deadline = task
+    search = worker
+    g = search.game
+    search.killers = [[None, None] for _ in range(depth + 1)]
+    search.nodes = 0
+    search.check_at = 1024
+    search.deadline = deadline
+
+    counts = mine + g.steps[square]
+    if (counts + g.bias) & g.top:
+        score = WIN - (me | them).bit_count() - 1
+    else:
+        # Anything no better than the best root move so far need only be
+        # shown to be so
+        alpha = shared_best[0]
+        alpha = -math.inf if alpha == NO_BOUND else alpha
+        try:
+            score = -search._search(them, me | 1 << square, theirs, counts, depth - 1,
+                                    -math.inf, -alpha, 1)
+        except OutOfTime:
+            return square, None, search.nodes
+    with shared_best.get_lock():
+        if score > shared_best[0]:
+            shared_best[0], shared_best[1] = score, square
+    return square, score, search.nodes
+
+
+class ParallelSearch(Search):
+    """
+    A Search that splits every depth of its iterative deepening at the
+    root, searching the root moves across `processes` worker processes
+    (default: one per core) that share a transposition table.
+    """
+
+    def __init__(self, game, budget=1.0, processes=None, slots=TABLE_SLOTS):
+        if game.size > MAX_SQUARES:
+            raise ValueError(f"boards of more than {MAX_SQUARES} squares are too big to share")
+        super().__init__(game, budget)
+        self.processes = processes or os.cpu_count() or 1
+        # Fork, where there is one, starts workers without re-running the
+        # script that made the search, which may be a game loop with no
+        # main guard
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        self.table = SharedTable(slots, context=self.context)
+        # The best root score proven at this depth, and its square
+        self.best = self.context.Array("q", [NO_BOUND, -1])
+        self.pool = None
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _make_room(self):
+        # The shared table is a fixed size, and overwrites as it goes
+        pass
+
+    def _root(self, me, them, mine, theirs, depth, previous):
+        """
+        Returns the score and best square of a search `depth` plies deep,
+        with the root moves shared out among the workers, `previous`, the
+        best square of the last depth, first.
+        """
+        g = self.game
+        initargs = (g.rows, g.columns, g.k, self.table.arrays(), self.best)
+        if self.processes == 1:
+            # Search in this process, as the one worker
+            _init_worker(*initargs)
+        elif self.pool is None:
+            self.pool = self.context.Pool(self.processes, _init_worker, initargs)
+
+        self.best[0], self.best[1] = NO_BOUND, -1
+        tasks = [
+            (me, them, mine, theirs, square, depth, self.deadline)
+            for square in self._ordered(me | them, previous, 0)
+        ]
+        if self.processes == 1:
+            results = map(_search_move, tasks)
+        else:
+            results = self.pool.imap_unordered(_search_move, tasks)
+        finished = True
+        for _, score, nodes in results:
+            self.nodes += nodes
+            finished = finished and score is not None
+        if not finished:
+            raise OutOfTime()
+        return self.best[0], self.best[1]
@@ -2,21 +2,45 @@
 Tic Tac Toe Player
 """
 
+import atexit
 import math
-import copy
+import os
+
+import bitboard
+import mnk
+from book import load_book
+from parallel import ParallelSearch
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Seconds the AI may think per move on boards bigger than 3x3
+TIME_LIMIT = 1.0
+
+# The opening book, loaded on first use; False until then
+book = False
+
+# A search per board size, line length and process count, so each keeps
+# its table
+searches = {}
 
-def initial_state():
+
+@atexit.register
+def close_searches():
+    """
+    Stop the worker processes of every parallel search.
+    """
+    for search in searches.values():
+        if isinstance(search, ParallelSearch):
+            search.close()
+
+
+def initial_state(rows=3, columns=3):
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * columns for _ in range(rows)]
 
 def player(board):
     """
@@ -31,8 +55,8 @@ def player(board):
                 x += 1
             elif item == "O":
                 o += 1
-    # If X and O is 9, it's no player's turn
-    if x + o == 9:
+    # If every square is taken, it's no player's turn
+    if x + o == len(board) * len(board[0]):
         return None
     # If X and O are equal, it's X's turn
     if x == o:
@@ -59,65 +83,94 @@ def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    # Copy board
-    new_board = copy.deepcopy(board)
     # If the action is invalid, raise an exception
-    validActions = actions(board)
-    if action not in validActions:
+    i, j = action
+    if not (0 <= i < len(board) and 0 <= j < len(board[0])) or board[i][j] != EMPTY:
         raise Exception("Invalid action")
+    # Copy board; cells are strings or None, so copying rows is enough
+    new_board = [row[:] for row in board]
     # Return the new board (determine player based on current board)
-    else:
-        new_board[action[0]][action[1]] = player(board)
-        return new_board
+    new_board[i][j] = player(board)
+    return new_board
 
-def winner(board):
+def winner(board, k=3):
     """
-    Returns the winner of the game, if there is one.
+    Returns the winner of the game, if there is one: the player with `k`
+    in a row across, down or diagonally.
     """
-    # Check rows
-    for row in board:
-        if row[0] == row[1] == row[2] and (row[0] is not EMPTY):
-            return row[0]
-    # Check columns
-    for i in range(3):
-        if board[0][i] == board[1][i] == board[2][i] and (board[0][i] is not EMPTY):
-            return board[0][i]
-    # Check diagonals
-    if board[0][0] == board[1][1] == board[2][2] and (board[0][0] is not EMPTY):
-        return board[0][0]
-    if board[0][2] == board[1][1] == board[2][0] and (board[0][2] is not EMPTY):
-        return board[0][2]
+    game = mnk.game(len(board), len(board[0]), k)
+    x, o = game.from_board(board)
+    if game.won(x):
+        return X
+    if game.won(o):
+        return O
     return EMPTY
 
-def terminal(board):
+def terminal(board, k=3):
     """
     Returns True if game is over, False otherwise.
     """
-    # If there is a winner, the game is over
-    if winner(board) != EMPTY:
-        return True
-    # If any squares aren't filled, the game isn't over
-    for row in board:
-        for cell in row:
-            if cell == EMPTY:
-                return False
-    return True
+    # The game is over if either player has a line or no squares are left,
+    # all read off one pass over the board
+    game = mnk.game(len(board), len(board[0]), k)
+    x, o = game.from_board(board)
+    return game.won(x) or game.won(o) or x | o == game.full
 
-def utility(board):
+def utility(board, k=3):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
     # Check state of winner(board)
-    if winner(board) == "X":
+    won = winner(board, k)
+    if won == "X":
         return 1
-    elif winner(board) == "O":
+    elif won == "O":
         return -1
     else:
         return 0
 
-def minimax(board):
+def minimax(board, k=3, time_limit=TIME_LIMIT, processes=1):
     """
     Returns the optimal action for the current player on the board.
+
+    Boards other than 3x3 with 3 in a row are too big to solve, so their
+    search gets `time_limit` seconds and plays the best move it finds,
+    split over `processes` worker processes if more than one and there
+    are at least that many cores; on fewer, the workers would only take
+    turns, and search less deeply than one process does.
+    """
+    rows, columns = len(board), len(board[0])
+    if (rows, columns, k) != (3, 3, 3):
+        game = mnk.game(rows, columns, k)
+        if processes > (os.cpu_count() or 1):
+            processes = 1
+        if (game, processes) not in searches:
+            searches[game, processes] = mnk.Search(game) if processes == 1 else ParallelSearch(game, processes=processes)
+        square = searches[game, processes].best_move(*game.from_board(board), time_limit)
+        if square is None:
+            return None
+        return divmod(square, columns)
+
+    global book
+    if book is False:
+        book = load_book()
+    x, o = bitboard.from_board(board)
+    found = book.lookup(x, o) if book is not None else None
+    if found is not None:
+        return divmod(found[0], 3)
+    # No book, or a position it doesn't hold: search bitboards,
+    # remembering every position's value between calls
+    square = bitboard.best_move(x, o)
+    if square is None:
+        return None
+    return divmod(square, 3)
+
+
+def legacy_minimax(board):
+    """
+    Returns the optimal action for the current player on the board, by
+    searching list-of-lists boards directly. Kept to check and time the
+    bitboard search against.
     """
     # Determine if we're X or O
     currentPlayer = player(board)
@@ -130,8 +183,9 @@ def minimax(board):
         actionList = actions(board)
         # For each action, generate the new state
         for action in actionList:
-            # Find the min value generated by that state
-            value = minValue(result(board, action), currentScore)
+            # Find the min value generated by that state; anything no better
+            # than the current score only needs to be shown to be so
+            value = minValue(result(board, action), currentScore, 2)
             # Else, if it's higher than the current, make it the new action
             if value == 1:
                 return action
@@ -147,7 +201,7 @@ def minimax(board):
         # For each action, generate the new state
         for action in actionList:
         # Find the max value generated by that state
-            value = maxValue(result(board, action), currentScore)
+            value = maxValue(result(board, action), -2, currentScore)
         # Else, if it's lower than the current, make it the new action and change score
             if value == -1:
                 return action
@@ -156,7 +210,7 @@ def minimax(board):
                 currentAction = action
         return currentAction
     
-def maxValue(board, lowest):
+def maxValue(board, alpha, beta):
    # If the game is over, return the value of the winner
    if terminal(board):
        return utility(board)
@@ -165,17 +219,15 @@ def maxValue(board, lowest):
    # minimum of the result of that action
    actionList = actions(board)
    for action in actionList:
-       v = max(v, minValue(result(board, action), v))
-       # If this set doesn't have the potential to be lower than what we already
-       # have, I don't even wanna calculate the rest.
-       if v > lowest:
-           return 0
-       # Already reached the best move 
-       if v == 1:
-        return v
+       v = max(v, minValue(result(board, action), alpha, beta))
+       # The minimising player already has a move worth beta, so won't let
+       # play get here; v is a lower bound, which is all they need to know
+       if v >= beta:
+           return v
+       alpha = max(alpha, v)
    return v    
 
-def minValue(board, highest):
+def minValue(board, alpha, beta):
    # If the game is over, return the value of the winner
    if terminal(board):
        return utility(board)
@@ -184,12 +236,10 @@ def minValue(board, highest):
    # maximum of the result of that action
    actionList = actions(board)
    for action in actionList:
-       v = min(v, maxValue(result(board, action), v))
-       # If this set doesn't have the potential to be higher than what we already
-       # have, I don't even wanna calculate the rest.
-       if v < highest:
-           return 0
-       # Already reached the best move 
-       if v == -1:
-        return v
+       v = min(v, maxValue(result(board, action), alpha, beta))
+       # The maximising player already has a move worth alpha, so won't let
+       # play get here; v is an upper bound, which is all they need to know
+       if v <= alpha:
+           return v
+       beta = min(beta, v)
    return v